@@ -22,9 +22,10 @@ class Exp:
         self.name = name
         self.model_builder = model_builder
         self.accs = list()
-        self.is_ours = type(model_builder()) is D2L or type(model_builder()) is PLP_Grammar
-        self.is_gg = type(model_builder()) is GGbaseline
-        self.multi_rules = self.is_ours and type(model_builder()) is PLP_Grammar
+        model_type = type(model_builder())
+        self.is_ours = model_type is D2L or model_type is PLP_Grammar
+        self.is_gg = model_type is GGbaseline
+        self.multi_rules = self.is_ours and model_type is PLP_Grammar
         if self.is_ours:
             self.rules = defaultdict(int)
 
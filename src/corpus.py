@@ -0,0 +1,312 @@
+import os
+import json
+import numpy as np
+
+from utils import load
+from encoded_sequence import EncodedSequence
+from lru_cache import LRUCache
+
+# the binary corpus format (see Corpus.save()): the magic bytes, the length of the JSON header, the header, and then the arrays, each aligned to 8 bytes
+MAGIC = b'D2LCORP1'
+FORMAT_VERSION = 1
+ARRAY_DTYPES = {'offsets': np.int64, 'counts': np.int64, 'freqs': np.float64, 'uf': np.uint16, 'sf': np.uint16}
+
+class Corpus:
+    '''
+    A set of (uf, sf) pairs encoded as two flat arrays of segment ids (one for the UFs, one for the SFs),
+    which share an array of offsets (CSR-style): the i-th pair spans self.uf[self.offsets[i]:self.offsets[i + 1]] and likewise for self.sf.
+
+    Pairs are deduplicated at the type level; self.counts holds the number of tokens of each type and self.freqs the sum of their frequencies.
+    '''
+    def __init__(self, pairs, seginv, freqs=None):
+        '''
+        :pairs: an iterable of (uf, sf) pairs (strs or sequences), where each uf is the same length as its sf
+        :seginv: the SegmentInventory used to encode the segments (any segments not yet in it are added)
+        :freqs: (optional) an iterable of the frequency of each pair (e.g., the Freq column returned by utils.load)
+        '''
+        self.seginv = seginv
+        type_to_idx = dict()
+        uf_ids, sf_ids, offsets, counts, type_freqs = list(), list(), [0], list(), list()
+        freqs = iter(freqs) if freqs is not None else None
+        for uf, sf in pairs:
+            freq = next(freqs) if freqs is not None else 0
+            key = (f'{uf}', f'{sf}')
+            if key in type_to_idx:
+                idx = type_to_idx[key]
+                counts[idx] += 1
+                type_freqs[idx] += freq
+                continue
+            if len(uf) != len(sf):
+                raise ValueError(f'The uf and sf of each pair must be the same length, but |{uf}| = {len(uf)} and |{sf}| = {len(sf)}')
+            type_to_idx[key] = len(counts)
+            for seq, ids in ((uf, uf_ids), (sf, sf_ids)):
+                if type(seq) is EncodedSequence and seq.seginv.table is seginv.table: # already encoded
+                    seginv.add_segments(seginv.id_to_ipa[seg_id] for seg_id in seq.ids)
+                    ids.extend(seq.ids)
+                else:
+                    seginv.add_segments_from_str(seq)
+                    ids.extend(seginv.get_id(seg) for seg in seq)
+            offsets.append(len(uf_ids))
+            counts.append(1)
+            type_freqs.append(freq)
+
+        self.uf = np.array(uf_ids, dtype=np.uint16)
+        self.sf = np.array(sf_ids, dtype=np.uint16)
+        self.offsets = np.array(offsets, dtype=np.int64)
+        self.counts = np.array(counts, dtype=np.int64)
+        self.freqs = np.array(type_freqs, dtype=np.float64) if freqs is not None else None
+        self._pairs = None
+        self._index = None
+        self._segment_counts = LRUCache(maxsize=2 ** 6)
+
+    def save(self, path):
+        '''
+        Writes the corpus to :path: in a binary format that Corpus.open() can memory-map.
+
+        The header records the feature table's segment alphabet (the ipa of each id) and the segments the corpus uses,
+        so the file can be opened against any SegmentInventory (the ids are remapped if its table differs).
+        '''
+        arrays = {'offsets': self.offsets, 'counts': self.counts, 'uf': self.uf, 'sf': self.sf}
+        if self.freqs is not None:
+            arrays['freqs'] = self.freqs
+        used = np.union1d(np.unique(self.uf), np.unique(self.sf)).tolist()
+        header = {
+            'version': FORMAT_VERSION,
+            'alphabet': list(self.seginv.id_to_ipa),
+            'segments': list(self.seginv.id_to_ipa[seg_id] for seg_id in used)
+        }
+        # the offsets of the arrays are relative to the start of the data, which follows the (aligned) header
+        layout, pos = dict(), 0
+        for name, arr in arrays.items():
+            layout[name] = [pos, len(arr)]
+            pos += _align(arr.nbytes)
+        header['arrays'] = layout
+        header_bytes = json.dumps(header, ensure_ascii=False).encode('utf-8')
+        data_start = _align(len(MAGIC) + 8 + len(header_bytes))
+
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(MAGIC)
+            f.write(np.uint64(len(header_bytes)).tobytes())
+            f.write(header_bytes)
+            for name, arr in arrays.items():
+                f.write(b'\0' * (data_start + layout[name][0] - f.tell()))
+                f.write(np.ascontiguousarray(arr, dtype=ARRAY_DTYPES[name]).tobytes())
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def open(path, seginv):
+        '''
+        :path: a file written by Corpus.save()
+        :seginv: the SegmentInventory to use (the segments of the corpus are added to it)
+
+        :return: a Corpus whose arrays are read-only memory maps of :path:, so opening is O(1) and processes that open the same file share its pages.
+                 If :seginv: uses a different feature table than the one the file was written with, the uf and sf ids are remapped into memory instead.
+        '''
+        with open(path, 'rb') as f:
+            magic = f.read(len(MAGIC))
+            if magic != MAGIC:
+                raise ValueError(f'{path} is not a binary corpus file.')
+            header_len = int(np.frombuffer(f.read(8), dtype=np.uint64)[0])
+            header = json.loads(f.read(header_len).decode('utf-8'))
+        data_start = _align(len(MAGIC) + 8 + header_len)
+        if header['version'] != FORMAT_VERSION:
+            raise ValueError(f'{path} has format version {header["version"]}, but version {FORMAT_VERSION} is required.')
+
+        arrays = dict()
+        for name, (offset, length) in header['arrays'].items():
+            if length == 0:
+                arrays[name] = np.zeros(0, dtype=ARRAY_DTYPES[name])
+            else:
+                arrays[name] = np.memmap(path, dtype=ARRAY_DTYPES[name], mode='r', offset=data_start + offset, shape=(length,))
+
+        missing = list(ipa for ipa in header['segments'] if ipa not in seginv.ipa_to_id)
+        if missing:
+            raise ValueError(f'The segments {missing} of {path} are not in the feature file of the segment inventory.')
+        seginv.add_segments(header['segments'])
+        if tuple(header['alphabet']) != seginv.id_to_ipa:
+            remap = np.zeros(len(header['alphabet']), dtype=np.uint16)
+            alphabet_ids = dict((ipa, seg_id) for seg_id, ipa in enumerate(header['alphabet']))
+            for ipa in header['segments']:
+                remap[alphabet_ids[ipa]] = seginv.get_id(ipa)
+            arrays['uf'], arrays['sf'] = remap[arrays['uf']], remap[arrays['sf']]
+
+        corpus = Corpus.__new__(Corpus)
+        corpus.seginv = seginv
+        corpus.uf, corpus.sf = arrays['uf'], arrays['sf']
+        corpus.offsets, corpus.counts = arrays['offsets'], arrays['counts']
+        corpus.freqs = arrays.get('freqs')
+        corpus._pairs = None
+        corpus._index = None
+        corpus._segment_counts = LRUCache(maxsize=2 ** 6)
+        return corpus
+
+    @staticmethod
+    def from_file(fname, seginv, sep='\t', skip_header=False):
+        '''
+        :return: a Corpus of the pairs in the file :fname: (in the format read by utils.load), with frequencies from its Freq column
+        '''
+        pairs, freqs = load(fname, sep=sep, skip_header=skip_header)
+        return Corpus(pairs, seginv, freqs=freqs)
+
+    @property
+    def lengths(self):
+        '''
+        :return: an array of the length of each pair
+        '''
+        return np.diff(self.offsets)
+
+    @property
+    def pairs(self):
+        '''
+        :return: a list of the (uf, sf) pairs as EncodedSequences, which are views onto the flat arrays.
+                 The list holds two objects per pair, so code that may run over large corpora should index (see __getitem__() and uf_at()) or iterate instead.
+        '''
+        if self._pairs is None:
+            uf, sf = memoryview(self.uf), memoryview(self.sf)
+            bounds = self.offsets.tolist()
+            self._pairs = list((EncodedSequence(uf[start:end], self.seginv), EncodedSequence(sf[start:end], self.seginv))
+                               for start, end in zip(bounds, bounds[1:]))
+        return self._pairs
+
+    def pairs_with(self, seg_ids):
+        '''
+        :seg_ids: an iterable of segment ids
+
+        :return: a sorted array of the indices of the pairs whose ufs contain any of the :seg_ids:
+        '''
+        self.build_index()
+        parts = list(self._index[seg_id] for seg_id in seg_ids if seg_id in self._index)
+        if len(parts) == 0:
+            return np.zeros(0, dtype=np.int64)
+        return parts[0] if len(parts) == 1 else np.unique(np.concatenate(parts))
+
+    def build_index(self):
+        '''
+        Builds the inverted index from each segment id to the (sorted) indices of the pairs whose ufs contain it, unless it has been built.
+        The index is only published once complete, so threads that share the corpus never read a partial index.
+        '''
+        if self._index is not None:
+            return
+        pair_idxs = np.repeat(np.arange(len(self), dtype=np.int64), np.diff(self.offsets))
+        order = np.lexsort((pair_idxs, self.uf)) # by segment id, then by pair
+        seg_ids, pair_idxs = self.uf[order].astype(np.int64), pair_idxs[order]
+        starts = np.flatnonzero(np.diff(seg_ids, prepend=-1))
+        index = dict()
+        for start, end in zip(starts.tolist(), starts[1:].tolist() + [len(seg_ids)]):
+            index[int(seg_ids[start])] = np.unique(pair_idxs[start:end])
+        self._index = index
+
+    def count_segments(self, seg_mask):
+        '''
+        Counts the segments of each uf that are in :seg_mask:, which is computed once per mask (rules with the same targets share it).
+
+        :seg_mask: a bitmask over segment ids (see SegmentInventory.table_mask())
+
+        :return: an array of the number of such segments in the uf of each pair, and their total
+        '''
+        counts = self._segment_counts.get(seg_mask)
+        if counts is None:
+            seg_ids = list(seg_id for seg_id in range(seg_mask.bit_length()) if seg_mask >> seg_id & 1)
+            is_member = np.zeros(max(seg_mask.bit_length(), int(self.uf.max(initial=0)) + 1), dtype=bool)
+            is_member[seg_ids] = True
+            cum_members = np.zeros(len(self.uf) + 1, dtype=np.int64)
+            np.cumsum(is_member[self.uf], out=cum_members[1:])
+            per_pair = cum_members[self.offsets[1:]] - cum_members[self.offsets[:-1]]
+            counts = (per_pair, int(cum_members[-1]))
+            self._segment_counts.put(seg_mask, counts)
+        return counts
+
+    def select(self, pair_idxs):
+        '''
+        :pair_idxs: a sorted array of pair indices
+
+        :return: the indices into the flat arrays of the segments of the pairs at :pair_idxs:, and the offsets of each pair into them
+        '''
+        return gather_ragged(self.offsets, pair_idxs)
+
+    def tokens(self):
+        '''
+        :return: a generator over the pairs, where each type is repeated once per token
+        '''
+        for pair, count in zip(self, self.counts.tolist()):
+            for _ in range(count):
+                yield pair
+
+    def __len__(self):
+        return len(self.counts)
+
+    def uf_at(self, idx):
+        '''
+        :return: the uf of the :idx:-th pair as an EncodedSequence, without creating its sf
+        '''
+        return self._view(self.uf, *self._bounds(idx))
+
+    def _bounds(self, idx):
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError(f'Pair index {idx} is out of range for {self}')
+        return self.offsets[idx : idx + 2].tolist()
+
+    def _view(self, ids, start, end):
+        return EncodedSequence(memoryview(ids)[start:end], self.seginv)
+
+    def __getitem__(self, idx):
+        '''
+        :idx: an int or a slice
+
+        :return: the (uf, sf) pair at :idx: (or a list of the pairs in the slice), without creating every pair of a (possibly very large) corpus
+        '''
+        if type(idx) is slice:
+            return list(self[i] for i in range(*idx.indices(len(self))))
+        if self._pairs is not None:
+            return self._pairs[idx]
+        start, end = self._bounds(idx)
+        return self._view(self.uf, start, end), self._view(self.sf, start, end)
+
+    def __iter__(self):
+        if self._pairs is not None:
+            return iter(self._pairs)
+        return (self[idx] for idx in range(len(self)))
+
+    def __str__(self):
+        return f'Corpus({len(self)} types, {int(self.counts.sum())} tokens, {len(self.uf)} segments)'
+
+    def __repr__(self):
+        return self.__str__()
+
+def gather_ragged(offsets, idxs):
+    '''
+    Gathers some of the words from flat arrays of ids.
+
+    :offsets: the offsets of the words into the flat arrays (i.e., word i is ids[offsets[i]:offsets[i + 1]])
+    :idxs: the indices of the words to gather
+
+    :return: the indices into the flat arrays of the segments of the gathered words (in order), and the offsets of each gathered word into them
+    '''
+    starts = offsets[idxs]
+    lengths = offsets[np.asarray(idxs) + 1] - starts
+    new_offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=new_offsets[1:])
+    flat = np.arange(new_offsets[-1], dtype=np.int64) + np.repeat(starts - new_offsets[:-1], lengths)
+    return flat, new_offsets
+
+def _align(n, alignment=8):
+    return (n + alignment - 1) // alignment * alignment
+
+if __name__ == '__main__':
+    import argparse
+    from segment_inventory import SegmentInventory
+
+    parser = argparse.ArgumentParser(description='Converts a (uf, sf, freq) TSV file (in the format read by utils.load) to the binary corpus format read by Corpus.open().')
+    parser.add_argument('path', type=str, help='the TSV file to convert')
+    parser.add_argument('--ipa-file', '-i', type=str, required=True, help='the feature file used to encode the segments (relative to src/, like the ipa_file of the models)')
+    parser.add_argument('--out', '-o', type=str, default=None, help='where to write the binary corpus (default: the TSV path with the extension .bin)')
+    parser.add_argument('--skip-header', action='store_true', help='skip the first line of the TSV file')
+    args = parser.parse_args()
+
+    out = args.out if args.out else f'{os.path.splitext(args.path)[0]}.bin'
+    corpus = Corpus.from_file(args.path, SegmentInventory(args.ipa_file, lazy=True), skip_header=args.skip_header)
+    corpus.save(out)
+    print(f'Wrote {corpus} to {out}')
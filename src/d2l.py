@@ -1,13 +1,19 @@
-from collections import defaultdict
+from collections import defaultdict, Counter
 import numpy as np
 import random
+import copy
+import time
 
 from model import Model
 from utils import tolerance_principle, LEFT_WORD_BOUNDARY, RIGHT_WORD_BOUNDARY, UNKNOWN_CHAR
 from rule import Rule
 from natural_class import NaturalClass
 from sequence import Sequence
-from tier import Tier
+from encoded_sequence import EncodedSequence
+from tier import Tier, IncrementalTier, TierProjection, project_ragged
+from tier_stats import TierStats
+from corpus import Corpus
+from lru_cache import LRUCache
 from discrepancy import Discrepancy
 from default_rule import DefaultRule
 
@@ -21,7 +27,20 @@ class D2L(Model):
                  underspec=True,
                  add_segs=False,
                  seginv=None,
+                 projection_cache_size=2 ** 16,
+                 changes_cache_size=2 ** 18,
+                 stats_cache_size=2 ** 10,
+                 executor=None,
+                 max_depth=None,
+                 time_budget=None,
+                 bounded=False,
                  verbose=True):
+        '''
+        :executor: (optional) a concurrent.futures.Executor (e.g., a ThreadPoolExecutor or ProcessPoolExecutor) on which run() performs the assimilation and dissimilation searches concurrently
+        :max_depth: (optional) the number of times each search can narrow the tier (see build_rule())
+        :time_budget: (optional) the number of seconds after which each search stops narrowing the tier
+        :bounded: if True, the search rejects the rules on a tier as soon as the Tolerance Principle provably fails for all of them, without counting them over all pairs (see Rule.verify())
+        '''
 
         super().__init__(ipa_file=ipa_file, 
                          add_segs=add_segs, 
@@ -30,43 +49,133 @@ class D2L(Model):
                          verbose=verbose)
 
         self.threshold = threshold
+        self.executor = executor
+        self.max_depth = max_depth
+        self.time_budget = time_budget
+        self.bounded = bounded
         self.pairs = set()
+        self._corpus = None
+        self.projections = LRUCache(maxsize=projection_cache_size) # tier projections, keyed by (tier mask, word or corpus)
+        self.stats = LRUCache(maxsize=stats_cache_size) # the TierStats of discrepancies on tiers (see tier_stats())
+        self.rule_changes = LRUCache(maxsize=changes_cache_size) # the changes of candidate rules, keyed by (rule key, inventory version, uf)
 
         self.discrepancy = None
         self.rule = None
         self.default = None
+        self._build_discrepancy = True # whether the discrepancy is computed from the pairs (see train())
+        self._n_c = None # the n and c of self.rule on the training pairs, which update() keeps current
+        self.search_trace = dict() # the tiers tried by the last run() of the assimilation (True) and dissimilation (False) searches (see build_rule())
 
     def run(self):
         '''
         Runs the model after computing the discrepancy and tabulating the training data.
         '''
+        self._n_c = None
         if self.discrepancy is None:
             return
-        assim_rule = self.build_rule(self.discrepancy, tierset=NaturalClass('*', self.seginv))
-        dissim_rule = self.build_rule(self.discrepancy, tierset=NaturalClass('*', self.seginv), assimilate=False)
+        if self.executor is None:
+            (assim_rule, assim_defaults, assim_trace), (dissim_rule, dissim_defaults, dissim_trace) = _search(self, True), _search(self, False)
+        else:
+            self._pairs_corpus().build_index() # build the corpus that the searches share, and its index, before they start
+            futures = list(self.executor.submit(_search, self, assimilate) for assimilate in (True, False))
+            (assim_rule, assim_defaults, assim_trace), (dissim_rule, dissim_defaults, dissim_trace) = (self._rebind(future.result()) for future in futures)
+        self.search_trace = {True: assim_trace, False: dissim_trace}
+        defaults = assim_defaults + dissim_defaults
+        if len(defaults) > 0: # the last default found, as if the searches had run one after the other
+            self.default = defaults[-1]
         if assim_rule and not dissim_rule:
             self.rule = assim_rule
         elif dissim_rule and not assim_rule:
             self.rule = dissim_rule
         elif assim_rule and dissim_rule:
-            assim_acc, dissim_acc = assim_rule.accuracy(self.pairs), dissim_rule.accuracy(self.pairs)
+            assim_acc, dissim_acc = self.evaluate(assim_rule).accuracy(), self.evaluate(dissim_rule).accuracy()
             self.rule = assim_rule if assim_acc >= dissim_acc else dissim_rule
         else:
             self.rule = None
             self.default = None
 
+    def _rebind(self, result):
+        '''
+        Rebinds the rule, defaults and trace of a search in another process (see run()) to the model's SegmentInventory and projection cache.
+        '''
+        rule, defaults, trace = result
+        memo = dict()
+        for found in [rule] + defaults + list(visit['rule'] for visit in trace) + list(visit['tier'] for visit in trace):
+            if found is not None and found.seginv is not self.seginv:
+                memo[id(found.seginv)] = self.seginv
+                tier = found if type(found) is Tier else getattr(found, 'tier', None) # DefaultRules have no tier
+                if tier is not None:
+                    memo[id(tier.cache)] = self.projections
+        return copy.deepcopy(result, memo) if memo else result
+
     def train(self, pairs, discrepancy=None):
         '''
         Trains the model.
+
+        :pairs: an iterable of (uf, sf) pairs, e.g., a list of strs or a Corpus
         '''
         self.pairs = set()
+        self._corpus = None
         self.discrepancy = discrepancy
+        self._build_discrepancy = discrepancy is None
         self.rule = None
         for pair in pairs:
-            self.add_incremental(pair, build_discrepancy=discrepancy is None)
+            self.add_incremental(pair, build_discrepancy=self._build_discrepancy)
         self.run()
         return self
 
+    def update(self, pairs):
+        '''
+        Learns online from a batch of new (uf, sf) pairs, warm-starting from the current rule: its n and c are only updated with the new words,
+        and the rule is only searched for again (over all pairs, see run()) if it no longer passes the threshold, if the new words have alternations that are new to the discrepancy,
+        or if they have alternations that neither the rule nor the default covers. There is also a search if there is no rule yet.
+        Otherwise, the rule is kept, even if a search over all pairs might now find a different one.
+
+        :pairs: an iterable of (uf, sf) pairs
+
+        :return: whether the rule was searched for again
+        '''
+        if self.rule is not None and self._n_c is None:
+            evaluation = self.evaluate(self.rule)
+            self._n_c = (evaluation.n, evaluation.c)
+        alternations = set(self.discrepancy.alternations) if self.discrepancy is not None else None
+        num_annotated = len(self.discrepancy.annotated) if self.discrepancy is not None else 0
+        new_pairs = list()
+        for pair in pairs:
+            num_pairs = len(self.pairs)
+            uf, sf = self.add_incremental(pair, build_discrepancy=self._build_discrepancy)
+            if len(self.pairs) > num_pairs: # n and c are computed over the distinct pairs
+                new_pairs.append((uf, sf))
+        if self.discrepancy is None: # no alternations yet
+            return False
+
+        if self.rule is not None and alternations == self.discrepancy.alternations:
+            n, c = self.rule.get_n_c(new_pairs)
+            n, c = self._n_c[0] + n, self._n_c[1] + c
+            if self.threshold(n=n, c=c) and self._covers(self.discrepancy.annotated[num_annotated:]):
+                self._n_c = (n, c)
+                return False
+        self.run()
+        return True
+
+    def _covers(self, annotated):
+        '''
+        :annotated: (uf, idx, sf_seg) sites of the discrepancy
+
+        :return: whether each site is changed by the rule or, if not, is produced by the default (i.e., the default/elsewhere condition still holds for them, see elsewhere())
+        '''
+        changed = dict()
+        for uf, idx, sf_seg in annotated:
+            if uf not in changed:
+                changed[uf] = set(it[0] for it in self.rule.get_changes(uf))
+            if idx in changed[uf]:
+                continue
+            if not self.underspec or self.default is None:
+                return False
+            if tuple(self.seginv.get_val(sf_seg, feat) for feat in self.discrepancy.feat_diff) != tuple(self.default.vals):
+                return False
+        return True
+
     def choose(self, uf, opt1, opt2):
         '''
         Run 2AFC trial.
@@ -82,16 +191,17 @@ class D2L(Model):
         '''
         Produce an sf for the input uf
         '''
-        self.seginv.add_segments_from_str(uf)
-        if type(uf) is str:
-            uf = Sequence(uf, seginv=self.seginv)
+        with self.seginv.session():
+            self.seginv.add_segments_from_str(uf)
+            if type(uf) is str:
+                uf = Sequence(uf, seginv=self.seginv)
 
-        sf = uf
-        if self.rule:
-            sf = self.rule(sf)
-        if self.underspec and self.default:
-            sf = self.default(sf)
-        return sf
+            sf = uf
+            if self.rule:
+                sf = self.rule(sf)
+            if self.underspec and self.default:
+                sf = self.default(sf)
+            return sf
 
     # calling the D2L object amounts to calling its produce() method
     __call__ = produce
@@ -103,8 +213,10 @@ class D2L(Model):
         uf, sf = pair
         self.seginv.add_segments_from_str(uf)
         self.seginv.add_segments_from_str(sf)
-        uf, sf = Sequence(uf, self.seginv), Sequence(sf, self.seginv)
-        self.pairs.add((uf, sf))
+        uf, sf = EncodedSequence.encode(uf, self.seginv), EncodedSequence.encode(sf, self.seginv)
+        if (uf, sf) not in self.pairs:
+            self.pairs.add((uf, sf))
+            self._corpus = None # the pairs changed
 
         if build_discrepancy:
             for i in range(len(uf)):
@@ -123,44 +235,104 @@ class D2L(Model):
 
         :left_right: if 'left,' returns left contexts, otherwise (e.g., 'right'), returns right contexts
         '''
-        ctxts = set()
-        for uf, sf in self.pairs:
-            uf_tier, sf_tier = tier.project(uf, sf)
-            for i in range(len(uf_tier)):
-                uf_tier_seg, sf_tier_seg = uf_tier[i], sf_tier[i]
-                if (uf_tier_seg, sf_tier_seg) in discrep:
-                    if left_right == 'left': # left contexts
-                        if i == 0:
-                            ctxts.add(LEFT_WORD_BOUNDARY)
-                        else:
-                            ctxts.add(uf_tier[i - 1])
-                    else: # right contexts
-                        if i == len(uf_tier) - 1:
-                            ctxts.add(RIGHT_WORD_BOUNDARY)
-                        else:
-                            ctxts.add(uf_tier[i + 1])
-        return ctxts
+        return self.tier_stats(discrep, tier).contexts(left_right)
+
+    def tier_stats(self, discrep, tier):
+        '''
+        Computes the left and right contexts of the alternations in :discrep: on the :tier:, and the adjacent segments that they do not assimilate or dissimilate to,
+        in a single pass over the tier projection of the training pairs. The stats are cached in self.stats, so the assimilation and dissimilation searches share them.
+
+        :return: a TierStats
+        '''
+        corpus = self._pairs_corpus()
+        alternations = frozenset((self.seginv.get_id(uf_seg), self.seginv.get_id(sf_seg)) for uf_seg, sf_seg in discrep.alternations)
+        key = (tier.mask, corpus, discrep.feat_diff, alternations, self.underspec)
+        stats = self.stats.get(key)
+        if stats is not None:
+            return stats
+
+        tables = dict((assimilate, self.seginv.transition_table(discrep.feat_diff, self.underspec, assimilate=assimilate)) for assimilate in (True, False))
+        lc_ids, rc_ids, failed_ids = set(), set(), dict((assimilate, set()) for assimilate in tables)
+        proj, hits = self._project_alternations(discrep, tier)
+        offsets, word_idxs = proj.offsets.tolist(), np.searchsorted(proj.offsets, hits, side='right') - 1
+        uf_tier, sf_tier = proj.uf.tolist(), proj.sf.tolist()
+        for i, word_idx in zip(hits.tolist(), word_idxs.tolist()):
+            seg_id, sf_id = uf_tier[i], sf_tier[i]
+            adj = list()
+            if i == offsets[word_idx]:
+                lc_ids.add(None) # left word boundary
+            else:
+                lc_ids.add(uf_tier[i - 1])
+                adj.append(uf_tier[i - 1])
+            if i == offsets[word_idx + 1] - 1:
+                rc_ids.add(None) # right word boundary
+            else:
+                rc_ids.add(uf_tier[i + 1])
+                adj.append(uf_tier[i + 1])
+            for assimilate, table in tables.items():
+                for ctxt_id in adj:
+                    new_id = table[seg_id, ctxt_id]
+                    if new_id is None or new_id != sf_id: # (dis)similating to the context does not work
+                        failed_ids[assimilate].add(ctxt_id)
+        stats = TierStats.from_ids(self.seginv, lc_ids, rc_ids, failed_ids)
+        self.stats.put(key, stats)
+        return stats
+
+    def evaluate(self, rule):
+        '''
+        :return: the RuleEvaluation of :rule: on the training pairs, reusing the memoized changes of equivalent rules
+        '''
+        return rule.evaluate_many(self._pairs_corpus(), memo=self.rule_changes)
+
+    def _pairs_corpus(self):
+        '''
+        :return: self.pairs as a Corpus, which is rebuilt after train() or add_incremental() changes the pairs
+        '''
+        if self._corpus is None:
+            self._corpus = Corpus(self.pairs, self.seginv)
+        return self._corpus
+
+    def _project_alternations(self, discrep, tier):
+        '''
+        Projects the pairs with a site of :discrep: onto the :tier: at once (the other pairs have no alternations to gather stats about).
+
+        :return: the TierProjection of those pairs and the (sorted) indices into its flat arrays of the (uf, sf) tier segments that are alternations in :discrep:
+        '''
+        corpus = self._pairs_corpus()
+        pair_idxs, positions, has_site = discrep.sites(corpus, self.seginv)
+        is_site = np.zeros(len(corpus.uf), dtype=bool)
+        is_site[corpus.offsets[pair_idxs] + positions] = True
+        flat, offsets = corpus.select(np.flatnonzero(has_site))
+        uf, offsets, positions, keep = project_ragged(corpus.uf[flat], offsets, tier.member)
+        proj = TierProjection(uf, corpus.sf[flat][keep], offsets, positions, self.seginv)
+        return proj, np.flatnonzero(is_site[flat][keep])
 
     def get_best_sep(self, pos, neg):
         '''
         Computes the feature that best separates the :pos: segments, which must be on the tier, from the :neg: segments, which should not be on the tier.
         '''
         pos_feats = self.seginv.shared_feats(pos)
+        neg_mask = self.seginv.get_mask(neg)
 
         separate = dict()
         for feat in pos_feats:
-            delset = self.seginv.extension_complement({feat})
-            if len(neg.difference(delset)) == 0:
-                separate[feat] = len(delset) # quality of perf splits is determined by how many segs in delset
+            del_mask = self.seginv.active_mask & ~self.seginv.extension_mask({feat})
+            if neg_mask & ~del_mask == 0:
+                separate[feat] = del_mask.bit_count() # quality of perf splits is determined by how many segs in delset
         if len(separate) == 0:
             return None
         return sorted(separate.items(), key=lambda it: (it[-1], it[0][1:]))[0][0] # return the feat that leads to smallest delset
 
-    def elsewhere(self, discrep, rule):
+    def elsewhere(self, discrep, rule, evaluation=None, defaults=None):
         '''
         Computes the default/elsewhere condition, if one works.
+
+        :evaluation: (optional) the RuleEvaluation of :rule: on the training pairs, if it has already been computed
+        :defaults: (optional) a list to append the default to, if one works; otherwise, it is set as self.default
         '''
-        covered = set(it[:-1] for it in rule.get_apps(self.pairs))
+        if evaluation is None:
+            evaluation = self.evaluate(rule)
+        covered = set(it[:-1] for it in evaluation.get_apps())
         need_covered = set(it[:-1] for it in discrep.annotated)
         if len(need_covered.difference(covered)) == 0:
             return True
@@ -175,16 +347,24 @@ class D2L(Model):
             default = sorted(default_options.items(), reverse=True, key=lambda it: it[-1])[0]
             c, n = default[1], sum(default_options.values())
             if c == n: # As described in Sec 2.3.3, we require no alternation among underextensions. Future work could soften this using the Tolerance Principle
-                self.default = DefaultRule(target=set(alt[0] for alt in discrep.alternations), feats=discrep.feat_diff, vals=default[0], seginv=self.seginv)
+                default_rule = DefaultRule(target=set(alt[0] for alt in discrep.alternations), feats=discrep.feat_diff, vals=default[0], seginv=self.seginv)
+                if defaults is None:
+                    self.default = default_rule
+                else:
+                    defaults.append(default_rule)
                 return True
         return False
 
-    def build_tierset(self, discrep, tier, assimilate):
+    def build_tierset(self, discrep, tier, assimilate, stats=None):
         '''
+        :stats: (optional) the TierStats of :discrep: on the :tier:, if they have already been computed
+
         :return: a set or NaturalClass to be deleted to form a tier.
         '''
         currently_deleted_segs = tier.delset
-        adj_that_do_not_work = self.get_adj_that_do_not_work(discrep, tier, assimilate=assimilate)
+        if stats is None:
+            stats = self.tier_stats(discrep, tier)
+        adj_that_do_not_work = stats.adj_that_do_not_work(assimilate)
         pos = list(discrep.get_alternating()) # positive class is alternating segs
         neg = adj_that_do_not_work.union(currently_deleted_segs).difference(pos).difference({UNKNOWN_CHAR}) # negative class is adj segments that don't work with the alternation (del pos b.c. alternating segs must be on tier)
         if len(neg) == 0: # cannot construct a tier when there are no items we know cannot be on the tier
@@ -193,78 +373,169 @@ class D2L(Model):
         best = self.get_best_sep(pos, neg)
         if best is None: # no feature separates pos/neg
             neg_complement = self.seginv.complement(neg).difference({UNKNOWN_CHAR})
-            will_not_work = self.get_adj_that_do_not_work(discrep, Tier(neg_complement, self.seginv), assimilate=assimilate).difference(pos)
+            # narrow the tier incrementally: removing segments only changes the adjacent segments in the pairs that contain them
+            neg_tier = IncrementalTier(neg_complement, self.seginv, self._pairs_corpus(), cache=self.projections)
+            table = self.seginv.transition_table(discrep.feat_diff, self.underspec, assimilate=assimilate)
+            alternations = set((self.seginv.get_id(uf_seg), self.seginv.get_id(sf_seg)) for uf_seg, sf_seg in discrep.alternations)
+            pair_failures, failures = dict(), Counter() # the adjacent segments that do not work, per pair and in total
+            def update(pair_idxs):
+                for pair_idx in pair_idxs:
+                    failures.subtract(pair_failures.pop(pair_idx, ()))
+                    failed = self._tier_failures(neg_tier.uf_tiers[pair_idx], neg_tier.sf_tiers[pair_idx], alternations, table)
+                    if failed:
+                        pair_failures[pair_idx] = failed
+                        failures.update(failed)
+            _, _, has_site = discrep.sites(self._pairs_corpus(), self.seginv)
+            update(np.flatnonzero(has_site).tolist()) # only pairs with the alternation can have failures
+            will_not_work = set(self.seginv.get_segment(seg_id) for seg_id, count in failures.items() if count > 0).difference(pos)
             while neg_complement != neg_complement.difference(will_not_work):
                 neg_complement.difference_update(will_not_work) # exclude those that will not work
-                will_not_work = self.get_adj_that_do_not_work(discrep, Tier(neg_complement, self.seginv), assimilate=assimilate).difference(pos)
+                update(pair_idx for pair_idx in neg_tier.remove(will_not_work) if has_site[pair_idx])
+                will_not_work = set(self.seginv.get_segment(seg_id) for seg_id, count in failures.items() if count > 0).difference(pos)
             return neg_complement # preserve the complement of neg on the tier
 
         tierset = NaturalClass({best}, self.seginv)
         return tierset
 
-    def build_rule(self, discrep, tierset, depth=0, assimilate=True):
-        alternating_segs_ufs = discrep.get_alternating_ufs()
-        tier = Tier(tierset, self.seginv) # build a tier
+    def build_rule(self, discrep, tierset, depth=0, assimilate=True, defaults=None, trace=None):
+        '''
+        Searches for a rule, starting from the :tierset: and narrowing the tier (see build_tierset()) until a rule passes the threshold.
+        The search stops without a rule when no narrower tier can be built, when it reaches a tier it has already tried (tiers are identified by the segments on and off them),
+        or when it exceeds the model's depth or time budget (see self.max_depth and self.time_budget).
+
+        :depth: the depth of the :tierset: in the search
+        :defaults: (optional) a list to collect the defaults found during the search in (see elsewhere()); otherwise, each is set as self.default
+        :trace: (optional) a list to append a dict for each tier tried to, with its depth, tier, the best rule tried on it (or None), its n and c, whether it passed,
+                whether its rules were rejected early (see self.bounded), and the seconds spent
+
+        :return: the rule found, or None
+        '''
+        start = time.perf_counter()
+        visited = set() # the fingerprints of the tiers tried
+        while True:
+            tier = Tier(tierset, self.seginv, cache=self.projections) # build a tier
+            fingerprint = (tier.mask, self.seginv.table_mask(tier.delset))
+            if fingerprint in visited: # no progress was made
+                return None
+            visited.add(fingerprint)
+
+            tier_start = time.perf_counter()
+            r, evaluation, stats, pruned = self._try_tier(discrep, tier, assimilate, defaults)
+            n, c = (evaluation.n, evaluation.c) if r is not None else (None, None)
+            passed = r is not None and self.threshold(n=n, c=c)
+            if passed:
+                self._widen_ctxt(r, evaluation)
+                if self.verbose:
+                    print(f'**** Passed: {r} n = {n} c = {c} e = {n - c} <= {round(n / np.log(n), 1)} ****')
+            if trace is not None:
+                trace.append({'depth': depth, 'tier': tier, 'rule': r, 'n': n, 'c': c, 'passed': passed, 'pruned': pruned, 'seconds': time.perf_counter() - tier_start})
+            if passed:
+                return r
+
+            if self.max_depth is not None and depth >= self.max_depth: # out of depth budget
+                return None
+            if self.time_budget is not None and time.perf_counter() - start > self.time_budget: # out of time budget
+                return None
+            tierset = self.build_tierset(discrep, tier, assimilate=assimilate, stats=stats)
+            if tierset is None: # no tierset could be constructed (e.g., no neg items), so a rule cannot be found at this point
+                return None
+            depth += 1
+
+    def _try_tier(self, discrep, tier, assimilate, defaults):
+        '''
+        Builds the rules with the left and right contexts of the alternations on the :tier:.
+
+        In bounded mode (see self.bounded), whether the rules cover all alternations is decided on the pairs with alternations alone,
+        and the rules are only evaluated on all pairs if one of them passes the threshold (see Rule.verify()).
 
-        rs = list()
+        :return: the best rule that covers all alternations (or None) with its RuleEvaluation, the TierStats of the tier, and whether the rules were rejected early
+        '''
+        alternating_segs_ufs = discrep.get_alternating_ufs()
+        rs, evaluations = list(), dict()
+        stats = self.tier_stats(discrep, tier) # the contexts and failures of the alternations on the tier
+        if self.bounded:
+            corpus = self._pairs_corpus()
+            site_pairs = np.flatnonzero(discrep.sites(corpus, self.seginv)[2])
+            evaluate = lambda r: r.evaluate_many(corpus, memo=self.rule_changes, pair_idxs=site_pairs) # enough for elsewhere()
+        else:
+            evaluate = self.evaluate
         # try left contexts
-        lcset = self.contexts('left', discrep, tier) # get left contexts
+        lcset = stats.contexts('left') # get left contexts
         lr = Rule(target=alternating_segs_ufs, lc=lcset, feats=discrep.feat_diff, tier=tier, assimilate=assimilate, seginv=self.seginv, underspec=self.underspec) # build a rule
-        if self.elsewhere(discrep, lr): # rule must cover all alternations
+        evaluations[lr] = evaluate(lr)
+        if self.elsewhere(discrep, lr, evaluations[lr], defaults=defaults): # rule must cover all alternations
             rs.append(lr)
         # try right contexts
-        rcset = self.contexts('right', discrep, tier) # get right contexts
+        rcset = stats.contexts('right') # get right contexts
         rr = Rule(target=alternating_segs_ufs, rc=rcset, feats=discrep.feat_diff, tier=tier, assimilate=assimilate, seginv=self.seginv, underspec=self.underspec) # build a rule
-        if self.elsewhere(discrep, rr) and len(rcset.difference({LEFT_WORD_BOUNDARY, RIGHT_WORD_BOUNDARY})) != 0: # rule must cover all alternations
+        evaluations[rr] = evaluate(rr)
+        if self.elsewhere(discrep, rr, evaluations[rr], defaults=defaults) and len(rcset.difference({LEFT_WORD_BOUNDARY, RIGHT_WORD_BOUNDARY})) != 0: # rule must cover all alternations
             rs.append(rr)
+        if self.bounded and len(rs) > 0:
+            # only the best rule is checked against the threshold, so the rules can only be skipped if they all fail it
+            verified = dict((r, r.verify(corpus, threshold=self.threshold, memo=self.rule_changes, evaluate=True)[3]) for r in rs)
+            if all(evaluation is None for evaluation in verified.values()):
+                return None, None, stats, True
+            # a rule that passed is evaluated by verify(), a rule that failed is still needed to rank them
+            evaluations = dict((r, verified[r] if verified[r] is not None else self.evaluate(r)) for r in rs)
 
         # choose the best rule
-        n_c = dict((r, r.get_n_c(self.pairs)) for r in rs)
+        n_c = dict((r, (evaluations[r].n, evaluations[r].c)) for r in rs)
         rs = sorted(rs, reverse=True, key=lambda r: n_c[r][1] / n_c[r][0])
-        if len(rs) > 0:
-            r = rs[0]
-            n, c = n_c[r]
-            if self.threshold(n=n, c=c):
-                ctxt = r.lc if r.lc else r.rc
-
-                # set the ctxt to equal the tier if the ctxt contains at least half the tier segments and doing so does not change the rule's accuracy
-                acc_before = r.accuracy(self.pairs)
-                r.update_c(r.tier.tierset)
-                acc_after = r.accuracy(self.pairs)
-                if acc_after < acc_before: # change it back
-                    r.update_c(ctxt)
+        if len(rs) == 0:
+            return None, None, stats, False
+        return rs[0], evaluations[rs[0]], stats, False
 
-                if self.verbose:
-                    print(f'**** Passed: {r} n = {n} c = {c} e = {n - c} <= {round(n / np.log(n), 1)} ****')
-                return r
+    def _widen_ctxt(self, r, evaluation):
+        '''
+        Sets the ctxt of the rule :r: to equal its tier if doing so does not decrease the rule's accuracy.
 
-        old_tierset = tierset
-        tierset = self.build_tierset(discrep, tier, assimilate=assimilate)
-        if tierset is None or old_tierset == tierset: # if no progress was made or no tierset could be constructed (e.g., no neg items), a rule cannot be found at this point
-            return None
-        return self.build_rule(discrep, tierset, depth=depth+1, assimilate=assimilate) # recurse
+        :evaluation: the RuleEvaluation of :r: (rules hash by their str, so it must be looked up before the ctxt changes)
+        '''
+        ctxt = r.lc if r.lc else r.rc
+        acc_before = evaluation.accuracy()
+        r.update_c(r.tier.tierset)
+        if ctxt and r.tier.tierset: # only the pairs the widened ctxt can affect are re-evaluated
+            changed_mask = self.seginv.table_mask(ctxt) ^ self.seginv.table_mask(r.tier.tierset)
+            acc_after = r.reevaluate(evaluation, changed_mask, memo=self.rule_changes).accuracy()
+        else:
+            acc_after = self.evaluate(r).accuracy()
+        if acc_after < acc_before: # change it back
+            r.update_c(ctxt)
 
     def get_adj_that_do_not_work(self, discrep, tier, assimilate):
-        operator = self.seginv.assimilate if assimilate else self.seginv.dissimilate
-        delset = set()
-        for uf, sf in self.pairs: # iterate over all pairs
-            uf_tier, sf_tier = tier.project(uf, sf) # project tier
-            for i in range(len(uf_tier)):
-                uf_tier_seg, sf_tier_seg = uf_tier[i], sf_tier[i]
-                if (uf_tier_seg, sf_tier_seg) in discrep: # if the discrepancy is the one we are trying to account for
-                    if i > 0: # left context
-                        lc = uf_tier[i - 1] # get left context
-                        new_seg = operator(seg=uf_tier_seg, tgt=lc, feats=discrep.feat_diff, only_underspec=self.underspec)
-                        failed = not new_seg or new_seg != sf_tier_seg
-                        if failed: # if assimilating to lc does not work, then add to delset
-                            delset.add(lc)
-                    if i < len(uf_tier) - 1: # right context
-                        rc = uf_tier[i + 1]
-                        new_seg = operator(seg=uf_tier_seg, tgt=rc, feats=discrep.feat_diff, only_underspec=self.underspec)
-                        failed = not new_seg or new_seg != sf_tier_seg
-                        if failed: # if assimilating to rc does not work, then add to delset
-                            delset.add(rc)
-        return delset
+        return self.tier_stats(discrep, tier).adj_that_do_not_work(assimilate)
+
+    def _tier_failures(self, uf_tier, sf_tier, alternations, table):
+        '''
+        :alternations: the (uf, sf) id pairs of the discrepancy
+
+        :return: a list of the ids of the segments adjacent to an alternation on the (uf_tier, sf_tier) of a single pair that the alternation does not assimilate to
+        '''
+        failed = list()
+        for i in range(len(uf_tier)):
+            if (uf_tier[i], sf_tier[i]) in alternations:
+                failed.extend(self._failed_contexts(uf_tier, sf_tier, i, 0, len(uf_tier), table))
+        return failed
+
+    def _failed_contexts(self, uf_tier, sf_tier, i, start, end, table):
+        '''
+        :i: the index of an alternation on the tier, which spans uf_tier[start:end]
+
+        :return: the ids of the left/right contexts of the alternation that it does not assimilate to (per the transition :table:)
+        '''
+        failed = list()
+        if i > start: # left context
+            lc = uf_tier[i - 1] # get left context
+            new_id = table[uf_tier[i], lc]
+            if new_id is None or new_id != sf_tier[i]: # if assimilating to lc does not work, then add to delset
+                failed.append(lc)
+        if i < end - 1: # right context
+            rc = uf_tier[i + 1]
+            new_id = table[uf_tier[i], rc]
+            if new_id is None or new_id != sf_tier[i]: # if assimilating to rc does not work, then add to delset
+                failed.append(rc)
+        return failed
 
     def __str__(self):
         if self.rule is None:
@@ -272,4 +543,14 @@ class D2L(Model):
         return f'{self.rule}'
 
     def __repr__(self):
-        return self.__str__()
\ No newline at end of file
+        return self.__str__()
+
+def _search(model, assimilate):
+    '''
+    Runs one of the searches of D2L.run(), which may be on a copy of the :model: in another process.
+
+    :return: the rule found (or None), the defaults found along the way (in order), and the trace of the tiers tried
+    '''
+    defaults, trace = list(), list()
+    rule = model.build_rule(model.discrepancy, tierset=NaturalClass('*', model.seginv), assimilate=assimilate, defaults=defaults, trace=trace)
+    return rule, defaults, trace
@@ -1,6 +1,5 @@
-from rule import Rule
+from rule import Rule, CompiledRule
 from segment_inventory import SegmentInventory
-from utils import UNKNOWN_CHAR
 
 class DefaultRule(Rule):
     '''
@@ -11,6 +10,7 @@ class DefaultRule(Rule):
         self.feats = feats
         self.vals = vals
         self.seginv = seginv if seginv else SegmentInventory()
+        self._compiled = None
 
     def __str__(self):
         return f'(default) {self.target} --> {self.vals} {self.feats} / __'
@@ -18,23 +18,28 @@ class DefaultRule(Rule):
     def __len__(self):
         return 1
 
-    def get_changes(self, s):
+    def compile(self):
         '''
-        Computes the changes that the rule should make to the sequence.
+        :return: the rule compiled to a CompiledDefaultRule
+        '''
+        if self._compiled is None:
+            self._compiled = CompiledDefaultRule(self)
+        return self._compiled
 
-        :s: a sequence
+class CompiledDefaultRule(CompiledRule):
+    '''
+    A DefaultRule compiled to a list marking which segments are in its target and the inventory's table of its feature values (see SegmentInventory.set_feats_table()).
+    '''
+    def __init__(self, rule):
+        self.seginv = rule.seginv
+        self.feats = rule.feats
+        self.vals = rule.vals
+        # the rule matches a segment by the first character of its ipa (see Rule.match())
+        self.target = list(ipa[0] in rule.target for ipa in self.seginv.id_to_ipa)
+        self.target_mask = sum(1 << seg_id for seg_id, in_target in enumerate(self.target) if in_target)
+        self.key = ('default', tuple(self.feats), tuple(self.vals), self.target_mask)
 
-        :return: a list of (idx, change) tuples, each which is a change to be carried out that the idx position of :s:
-        '''
-        k = len(self)
-        
-        changes = list()
-        for seq_ptr in range(len(s)):
-            seg = s[seq_ptr]
-            if self.match(seg): # check if window matches rule
-                new_seg_vec = list(seg.feature_vec)
-                for feat, val in zip(self.feats, self.vals):
-                    new_seg_vec[self.seginv.feature_space.index(feat)] = val
-                new_seg = self.seginv[new_seg_vec]
-                changes.append((seq_ptr, new_seg if new_seg else UNKNOWN_CHAR)) # add change to those that need to be made
-        return changes
+    def change_ids(self, s):
+        target = self.target
+        table = self.seginv.set_feats_table(self.feats, self.vals)
+        return list((seq_ptr, table[seg_id]) for seq_ptr, seg_id in enumerate(self.ids(s)) if target[seg_id])
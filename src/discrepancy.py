@@ -1,12 +1,34 @@
+import numpy as np
+
 class Discrepancy:
     def __init__(self, feat_diff):
         self.alternations = set()
         self.annotated = list()
         self.feat_diff = feat_diff
+        self._sites = None
 
     def add(self, uf, i, uf_seg, sf_seg):
         self.annotated.append((uf, i, sf_seg))
         self.alternations.add((uf_seg, sf_seg))
+        self._sites = None
+
+    def sites(self, corpus, seginv):
+        '''
+        Indexes the sites of the discrepancy in :corpus: (i.e., the positions where the uf and sf segments are one of its alternations).
+        The index is kept until the corpus or the discrepancy changes.
+
+        :return: the (sorted) indices of the pairs of the sites and the positions of the sites in them,
+                 and a boolean array over the pairs in :corpus: that is True for the pairs with any site
+        '''
+        if self._sites is None or self._sites[0] is not corpus:
+            num_ids = len(seginv.id_to_ipa)
+            alternations = np.array(list(seginv.get_id(uf_seg) * num_ids + seginv.get_id(sf_seg) for uf_seg, sf_seg in self.alternations), dtype=np.int64)
+            hits = np.flatnonzero(np.isin(corpus.uf.astype(np.int64) * num_ids + corpus.sf, alternations))
+            pair_idxs = np.searchsorted(corpus.offsets, hits, side='right') - 1
+            has_site = np.zeros(len(corpus), dtype=bool)
+            has_site[pair_idxs] = True
+            self._sites = (corpus, pair_idxs, hits - corpus.offsets[pair_idxs], has_site)
+        return self._sites[1:]
 
     def get_alternating(self):
         return set(it[0] for it in self.alternations).union(it[1] for it in self.alternations)
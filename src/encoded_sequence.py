@@ -0,0 +1,95 @@
+from array import array
+from segment import Segment
+from sequence import Sequence
+
+class EncodedSequence:
+    '''
+    An immutable sequence of Segments stored as a compact array of segment ids (see SegmentInventory.get_id()),
+    which otherwise behaves like a Sequence (and like a str).
+
+    Slices are views onto the same ids rather than copies, and the str and hash are computed once and cached.
+    '''
+    def __init__(self, seq, seginv):
+        '''
+        :seq: a str, an iterable of segments, or a buffer of segment ids (e.g., array('H'), a memoryview, or a uint16 NumPy array)
+        :seginv: the SegmentInventory the ids belong to
+        '''
+        self.seginv = seginv
+        if type(seq) is memoryview:
+            ids = seq
+        elif type(seq) is array or hasattr(seq, '__array_interface__'):
+            ids = memoryview(seq)
+        else:
+            ids = memoryview(array('H', (seginv.get_id(seg) for seg in seq)))
+        self.ids = ids
+        self._str = None
+        self._hash = None
+
+    @staticmethod
+    def encode(seq, seginv):
+        '''
+        :return: :seq: as an EncodedSequence of :seginv:, reusing the ids (without copying them) if :seq: is already encoded against the same feature table
+        '''
+        if type(seq) is EncodedSequence and seq.seginv.table is seginv.table:
+            return seq if seq.seginv is seginv else EncodedSequence(seq.ids, seginv)
+        return EncodedSequence(seq, seginv)
+
+    def copy(self):
+        '''
+        :return: a mutable Sequence with the same Segments
+        '''
+        return Sequence(list(self), self.seginv)
+
+    def __reduce__(self):
+        # memoryviews cannot be pickled, so copy the ids into an array
+        return (EncodedSequence, (array('H', self.ids), self.seginv))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __str__(self):
+        if self._str is None:
+            id_to_ipa = self.seginv.id_to_ipa
+            self._str = ''.join(id_to_ipa[seg_id] for seg_id in self.ids)
+        return self._str
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if type(other) is EncodedSequence and other.seginv.table is self.seginv.table:
+            return self.ids == other.ids
+        return f'{self}' == f'{other}'
+
+    def __neq__(self, other):
+        return not self.__eq__(other)
+
+    def __lt__(self, other):
+        return self.__str__() < other.__str__()
+
+    def __hash__(self):
+        if self._hash is None:
+            self._hash = hash(self.__str__())
+        return self._hash
+
+    def __getitem__(self, idx):
+        if type(idx) is slice:
+            return EncodedSequence(self.ids[idx], self.seginv)
+        seg_id = self.ids[idx]
+        seg = self.seginv._id_to_segment[seg_id]
+        if seg is None: # not created yet (e.g., by a lazy inventory)
+            seg = self.seginv.get_segment(seg_id)
+        return seg
+
+    def __iter__(self):
+        get_segment = self.seginv.get_segment
+        return (get_segment(seg_id) for seg_id in self.ids)
+
+    def __add__(self, other):
+        if type(other) is str:
+            return list(self) + [other]
+        elif type(other) is Segment:
+            return list(self) + [other.ipa]
+        return list(self) + list(other)
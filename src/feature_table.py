@@ -0,0 +1,117 @@
+import os
+import pickle
+import hashlib
+import numpy as np
+from utils import UNKNOWN_CHAR
+
+# integer codes used to store feature values in the feature matrix
+FEAT_VAL_TO_CODE = {'+': 1, '-': -1, '?': 0}
+CODE_TO_FEAT_VAL = {1: '+', -1: '-', 0: '?'}
+
+# bump whenever the attributes of FeatureTable change, so stale on-disk caches are re-parsed
+CACHE_VERSION = 2
+
+# in-process registry of loaded tables, keyed by (real path, mtime, size) of the feature file
+_REGISTRY = dict()
+
+class FeatureTable:
+    '''
+    The immutable, parsed contents of a feature file (e.g., data/ipa.txt), which can be shared by any number of SegmentInventory objects.
+
+    Every row of the file is given a dense integer id, and the feature values are stored in an int8 matrix (segments x features).
+    Use FeatureTable.load() rather than the constructor, so that tables are shared in-process and cached on disk.
+    '''
+    def __init__(self, text):
+        seg_to_feats = dict()
+        for i, line in enumerate(text.splitlines()):
+            line = line.strip().split('\t')
+            seg, feats = line[0], line[1:]
+            if i == 0:
+                feature_space = feats
+            else:
+                seg_to_feats[seg] = feats
+
+        seg_to_feats[UNKNOWN_CHAR] = ['?'] * len(feature_space)
+
+        self.feature_space = tuple(feature_space)
+        self.seg_to_feats = seg_to_feats
+        self.feat_to_idx = dict((feat, i) for i, feat in enumerate(self.feature_space))
+        self.id_to_ipa = tuple(self.seg_to_feats.keys())
+        self.ipa_to_id = dict((ipa, i) for i, ipa in enumerate(self.id_to_ipa))
+        self.feature_matrix = np.array([[FEAT_VAL_TO_CODE[val] for val in self.seg_to_feats[ipa]] for ipa in self.id_to_ipa], dtype=np.int8).reshape(len(self.id_to_ipa), len(self.feature_space))
+        self.vecs = tuple(tuple(row) for row in self.feature_matrix.tolist()) # the rows of the matrix as hashable tuples
+        self.vec_to_id = dict((vec, i) for i, vec in enumerate(self.vecs)) # if rows share a vector, the last one wins
+        self._build_masks()
+        self.feature_matrix.setflags(write=False)
+
+    def _build_masks(self):
+        '''
+        Precomputes, for each feature value (e.g., +cons), a bitmask over the ids of the segments that have that value,
+        and, for each segment, a bitmask over the specified feature values (bit 2i for +f_i and bit 2i + 1 for -f_i) it has.
+        '''
+        self.feat_masks = dict()
+        for feat_idx, feat in enumerate(self.feature_space):
+            col = self.feature_matrix[:, feat_idx]
+            for val, code in FEAT_VAL_TO_CODE.items():
+                mask = 0
+                for seg_id in np.flatnonzero(col == code).tolist():
+                    mask |= 1 << seg_id
+                self.feat_masks[f'{val}{feat}'] = mask
+        self.all_mask = (1 << len(self.id_to_ipa)) - 1
+        seg_feat_bits = list()
+        for vec in self.vecs:
+            bits = 0
+            for feat_idx, code in enumerate(vec):
+                if code == 1:
+                    bits |= 1 << (2 * feat_idx)
+                elif code == -1:
+                    bits |= 1 << (2 * feat_idx + 1)
+            seg_feat_bits.append(bits)
+        self.seg_feat_bits = tuple(seg_feat_bits)
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.feature_matrix.setflags(write=False)
+
+    def __len__(self):
+        return len(self.id_to_ipa)
+
+    @staticmethod
+    def load(path, use_cache=True):
+        '''
+        :path: the path to a feature file
+        :use_cache: if True, read (and write) the compiled table from/to a pickle stored next to :path:
+
+        :return: the FeatureTable for :path:, shared with every other caller in this process that loads the same (unchanged) file
+        '''
+        path = os.path.realpath(path)
+        stat = os.stat(path)
+        key = (path, stat.st_mtime_ns, stat.st_size)
+        if key not in _REGISTRY:
+            _REGISTRY[key] = FeatureTable._load_compiled(path, use_cache)
+        return _REGISTRY[key]
+
+    @staticmethod
+    def _load_compiled(path, use_cache):
+        with open(path, 'rb') as f:
+            raw = f.read()
+        digest = hashlib.sha1(raw).hexdigest()
+        cache_path = f'{path}.pkl'
+        if use_cache and os.path.exists(cache_path):
+            try:
+                with open(cache_path, 'rb') as f:
+                    version, cached_digest, table = pickle.load(f)
+                if version == CACHE_VERSION and cached_digest == digest:
+                    return table
+            except (OSError, pickle.UnpicklingError, EOFError, ValueError, AttributeError, ImportError):
+                pass # fall back to parsing the file
+        table = FeatureTable(raw.decode('utf-8'))
+        if use_cache:
+            try: # write to a temporary file and then rename it, so concurrent workers never read a partial cache
+                tmp_path = f'{cache_path}.{os.getpid()}.tmp'
+                with open(tmp_path, 'wb') as f:
+                    pickle.dump((CACHE_VERSION, digest, table), f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_path, cache_path)
+            except OSError:
+                pass # e.g., a read-only data directory; the cache is only an optimization
+        return table
@@ -3,6 +3,7 @@ import numpy as np
 from collections import defaultdict
 
 from phonotactic_model import PhonotacticModel
+from corpus import Corpus
 from tier import Tier
 
 class GRbaseline(PhonotacticModel):
@@ -17,6 +18,8 @@ class GRbaseline(PhonotacticModel):
         self.hmm = hmm.MultinomialHMM(n_components=num_hidden_states, n_iter=100)
 
     def train(self, pairs):
+        if type(pairs) is Corpus: # every count is over tokens, not types (see PhonotacticModel.get_sfs())
+            pairs = list(pairs.tokens())
         _ = self.get_sfs(pairs)
         seqs, lens = self.get_seqs(pairs)
         self.hmm.fit(seqs, lens) # fit HMM
@@ -0,0 +1,54 @@
+from collections import OrderedDict
+import threading
+
+class LRUCache:
+    '''
+    A bounded, thread-safe cache that evicts the least recently used entry once it holds :maxsize: entries,
+    and counts its hits and misses.
+
+    Copies (and pickles) of the cache start out empty, since its entries can always be recomputed.
+    '''
+    def __init__(self, maxsize=2 ** 16):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                val = self._entries[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return val
+
+    def put(self, key, val):
+        with self._lock:
+            self._entries[key] = val
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits, self.misses = 0, 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __reduce__(self):
+        return (LRUCache, (self.maxsize,))
+
+    def __str__(self):
+        return f'LRUCache({len(self)}/{self.maxsize} entries, {self.hits} hits, {self.misses} misses)'
+
+    def __repr__(self):
+        return self.__str__()
@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+import copy
 
 from segment_inventory import SegmentInventory
 
@@ -11,7 +12,7 @@ class Model:
         self.underspec = underspec
         self.add_segs = add_segs
         self.verbose = verbose
-        self.seginv = SegmentInventory(ipa_file=ipa_file, add_segs=add_segs)
+        self.seginv = SegmentInventory(ipa_file=ipa_file, add_segs=add_segs, lazy=add_segs) # only create the Segments that the data uses
         if seginv:
             self.seginv = seginv
 
@@ -27,6 +28,22 @@ class Model:
     def produce(self, uf):
         raise NotImplementedError('AbstractMethod produce(uf) is not implemented for this subclass.')
 
+    def freeze(self):
+        '''
+        :return: a copy of the (trained) model that uses a frozen snapshot of its SegmentInventory, so that produce() never mutates shared state.
+                 The copy can be shared by a pool of threads or forked workers, but cannot be trained further.
+        '''
+        memo = {id(self.seginv): self.seginv.freeze()}
+        if hasattr(self, 'pairs'): # the training data is not needed for inference, so share it rather than copying it
+            memo[id(self.pairs)] = self.pairs
+        return copy.deepcopy(self, memo)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        if state.get('executor') is not None: # executors cannot be copied or sent to other processes (e.g., by freeze())
+            state['executor'] = None
+        return state
+
     def accuracy(self, test, return_errors=False):
         errors = list()
         t, c, = 0, 0
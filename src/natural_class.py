@@ -1,4 +1,5 @@
 from utils import SYLLABLE_BOUNDARY, LEFT_WORD_BOUNDARY, RIGHT_WORD_BOUNDARY
+from segment import Segment
 
 class NaturalClass:
     def __init__(self, feats, seginv):
@@ -8,17 +9,19 @@ class NaturalClass:
         self._update()
 
     def segments(self):
-        segs = set()
-        for seg in self.seginv.segments:
-            if seg == '_':
-                continue
-            if seg in self:
-                segs.add(seg)
-        return segs
+        return self.seginv.from_mask(self.mask).difference({'_'})
 
     def _update(self):
+        '''
+        Recompiles the class after its features change.
+        '''
         self.name = '{' + ','.join(sorted(self.feats)) + '}'
-        self.extension_str = '{' + ','.join(sorted(f'{seg}' for seg in self.seginv.extension(self))) + '}'
+        self._key = '*' if self._wildcard else frozenset(self.feats)
+        self.mask = self.seginv.compile_class(self._key) # bitmask over the ids of the segments in the class
+
+    @property
+    def extension_str(self):
+        return self.seginv.extension_str(self._key)
 
     def add_feat(self, feat):
         self.feats.add(feat)
@@ -46,7 +49,8 @@ class NaturalClass:
             return False
         if len(item) > 1:
             return False
-        return self.seginv.feat_vals(f'{item}').intersection(self.feats) == self.feats
+        seg_id = self.seginv.ipa_to_id.get(item.ipa if type(item) is Segment else f'{item}')
+        return seg_id is not None and (self.mask >> seg_id) & 1 == 1
 
     def __len__(self):
         return len(self.feats)
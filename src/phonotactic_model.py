@@ -6,6 +6,7 @@ from collections import defaultdict
 
 from model import Model
 from sequence import Sequence
+from corpus import Corpus
 
 class PhonotacticModel(Model):
     '''
@@ -47,22 +48,25 @@ class PhonotacticModel(Model):
         return cands
 
     def produce(self, uf):
-        self.seginv.add_segments_from_str(uf)
-        if type(uf) is str:
-            uf = Sequence(uf, seginv=self.seginv)
-        
-        cands = self._get_candidates(uf)
-        scored = self.score(cands)
-        argmax = np.argmax(scored)
-        return cands[argmax]
+        with self.seginv.session():
+            self.seginv.add_segments_from_str(uf)
+            if type(uf) is str:
+                uf = Sequence(uf, seginv=self.seginv)
+            
+            cands = self._get_candidates(uf)
+            scored = self.score(cands)
+            argmax = np.argmax(scored)
+            return cands[argmax]
 
     def get_sfs(self, pairs):
         self.alternating_segs = defaultdict(set)
         sfs = list()
+        if type(pairs) is Corpus: # the phonotactic models count tokens, not types
+            pairs = pairs.tokens()
         for uf, sf in pairs:
             self.seginv.add_segments_from_str(uf)
             self.seginv.add_segments_from_str(sf)
-            sfs.append(sf)
+            sfs.append(f'{sf}')
             for i in range(len(uf)):
                 uf_seg, sf_seg = uf[i], sf[i]
                 if uf_seg != sf_seg: # update discrepancy
@@ -2,6 +2,7 @@ from model import Model
 from utils import tolerance_principle
 from d2l import D2L
 from sequence import Sequence
+from encoded_sequence import EncodedSequence
 from discrepancy import Discrepancy
 
 class PLP_Grammar(Model):
@@ -17,7 +18,16 @@ class PLP_Grammar(Model):
                  ipa_file='../data/ipa.txt',
                  underspec=True,
                  add_segs=False,
+                 executor=None,
+                 max_depth=None,
+                 time_budget=None,
+                 bounded=False,
                  verbose=True):
+        '''
+        :executor: (optional) a concurrent.futures.Executor on which each D2L runs its assimilation and dissimilation searches concurrently (see D2L.run())
+        :max_depth, time_budget: (optional) the budgets of each D2L search (see D2L.build_rule())
+        :bounded: if True, each D2L search rejects the rules on a tier early when they provably fail the Tolerance Principle (see D2L._try_tier())
+        '''
 
         super().__init__(ipa_file=ipa_file, 
                          add_segs=add_segs, 
@@ -25,6 +35,10 @@ class PLP_Grammar(Model):
                          verbose=verbose)
 
         self.threshold = threshold
+        self.executor = executor
+        self.max_depth = max_depth
+        self.time_budget = time_budget
+        self.bounded = bounded
         self.pairs = set()
 
         self.discrepancies = dict()
@@ -45,7 +59,11 @@ class PLP_Grammar(Model):
                       add_segs=self.add_segs, 
                       underspec=self.underspec, 
                       verbose=self.verbose, 
-                      seginv=self.seginv)
+                      seginv=self.seginv,
+                      executor=self.executor,
+                      max_depth=self.max_depth,
+                      time_budget=self.time_budget,
+                      bounded=self.bounded)
             d2l.train(self.pairs, discrepancy=discrep)
             if d2l.rule:
                 self.rules[discrep] = d2l.rule
@@ -53,19 +71,20 @@ class PLP_Grammar(Model):
                 self.defaults[discrep] = d2l.default
 
     def produce(self, uf):
-        self.seginv.add_segments_from_str(uf)
-        if type(uf) is str:
-            uf = Sequence(uf, seginv=self.seginv)
+        with self.seginv.session():
+            self.seginv.add_segments_from_str(uf)
+            if type(uf) is str:
+                uf = Sequence(uf, seginv=self.seginv)
 
-        sf = uf
-        for discrep in self.discrepancies:
-            rule = self.rules[discrep]
-            default = self.defaults[discrep]
-            if rule:
-                sf = rule(sf)
-            if self.underspec and default:
-                sf = default(sf)
-        return sf
+            sf = uf
+            for discrep in self.discrepancies:
+                rule = self.rules[discrep]
+                default = self.defaults[discrep]
+                if rule:
+                    sf = rule(sf)
+                if self.underspec and default:
+                    sf = default(sf)
+            return sf
 
     __call__ = produce
 
@@ -73,7 +92,7 @@ class PLP_Grammar(Model):
         uf, sf = pair
         self.seginv.add_segments_from_str(uf)
         self.seginv.add_segments_from_str(sf)
-        uf, sf = Sequence(uf, self.seginv), Sequence(sf, self.seginv)
+        uf, sf = EncodedSequence.encode(uf, self.seginv), EncodedSequence.encode(sf, self.seginv)
         self.pairs.add((uf, sf))
 
         for i in range(len(uf)):
@@ -1,8 +1,11 @@
 from utils import UNKNOWN_CHAR
-from utils import tolerance_principle
+from utils import tolerance_principle, tolerance_bounds
 from sequence import Sequence
+from encoded_sequence import EncodedSequence
 from segment_inventory import SegmentInventory
 from tier import Tier
+from corpus import Corpus
+import numpy as np
 
 class Rule:
     '''
@@ -22,6 +25,7 @@ class Rule:
         self.operator = self.seginv.assimilate if assimilate else self.seginv.dissimilate
         self.assimilate = assimilate
         self.underspec = underspec
+        self._compiled = None
 
     def update_c(self, c):
         if self.lc:
@@ -31,9 +35,11 @@ class Rule:
 
     def update_lc(self, lc):
         self.lc = lc
+        self._compiled = None
 
     def update_rc(self, rc):
         self.rc = rc
+        self._compiled = None
 
     def __str__(self):
         arrow = '-->' if self.assimilate else '<--'
@@ -59,6 +65,14 @@ class Rule:
             return 2
         return 1
 
+    def compile(self):
+        '''
+        :return: the rule compiled to a CompiledRule, which is reused until the context is updated
+        '''
+        if self._compiled is None:
+            self._compiled = CompiledRule(self)
+        return self._compiled
+
     def get_changes(self, s):
         '''
         Computes the changes that the rule should make to the sequence.
@@ -67,43 +81,7 @@ class Rule:
 
         :return: a list of (idx, change) tuples, each which is a change to be carried out that the idx position of :s:
         '''
-        k = len(self)
-        tier_seq = self.tier.project(s)
-        
-        changes = list()
-        left_to_right = self.lc is not None
-        tier_ptr = 0 if left_to_right else len(tier_seq) - 1 # a pointer that keeps track of where on the tier we are
-        seq_ptr = 0 if left_to_right else len(s) - 1 # a pointer that keeps track of where in the seq we are
-        while True:
-            seg = s[seq_ptr]
-            if seg in tier_seq: # on tier
-                # compute window
-                if not self.lc and not self.rc: # no context
-                    window = Sequence(seg, self.seginv)
-                elif self.lc and tier_ptr > 0: # left context
-                    window = Sequence(f'{tier_seq[tier_ptr - 1]}{seg}', self.seginv)
-                elif self.rc and tier_ptr < len(tier_seq) - 1: # right context
-                    window = Sequence(f'{seg}{tier_seq[tier_ptr + 1]}', self.seginv)
-                else:
-                    window = None
-                if window and self.match(window): # check if window matches rule
-                    if self.lc: # left context
-                        # only assimilate
-                        new_seg = self.operator(seg=seg, tgt=window[0], feats=self.feats, only_underspec=self.underspec) # assimilate left
-                    elif self.rc: # right context
-                        new_seg = self.operator(seg=seg, tgt=window[1], feats=self.feats, only_underspec=self.underspec) # assimilate right
-                    else: # no context
-                        new_seg = seg # assimilate with self (i.e., no change)
-                    changes.append((seq_ptr, new_seg if new_seg else UNKNOWN_CHAR)) # add change to those that need to be made
-                    if new_seg:
-                        tier_seq[tier_ptr] = new_seg # apply sequentially by updating tier with change too
-                tier_ptr += 1 if left_to_right else -1 # move forward on tier
-            seq_ptr += 1 if left_to_right else -1
-            if left_to_right and seq_ptr == len(s):
-                break
-            elif seq_ptr == -1:
-                break
-        return changes
+        return self.compile().get_changes(s)
 
     def apply(self, s):
         '''
@@ -121,19 +99,199 @@ class Rule:
     '''
     __call__ = apply
 
+    def evaluate_many(self, corpus, memo=None, pair_idxs=None):
+        '''
+        Applies the rule to the uf of every pair in :corpus: that contains a target segment (found with the inverted index of the corpus, see Corpus.pairs_with()),
+        and compares the changes to the sfs in one pass.
+
+        :corpus: a Corpus
+        :memo: (optional) an LRUCache of rule applications, which can be shared by every rule evaluated on the same data.
+               It holds the changes to each uf, keyed by (compiled rule key, inventory version, uf).
+        :pair_idxs: (optional) a sorted array of the indices of the pairs to apply the rule to (by default, all pairs)
+
+        :return: a RuleEvaluation
+        '''
+        compiled = self.compile()
+        rule_key = (compiled.key, self.seginv.version)
+        targeted = corpus.pairs_with(compiled.target_ids()) # words without a target segment cannot change
+        if pair_idxs is not None:
+            targeted = np.intersect1d(targeted, pair_idxs, assume_unique=True)
+        return self._evaluate_pairs(corpus, targeted.tolist(), rule_key, memo)
+
+    def verify(self, pairs, threshold=tolerance_principle, memo=None, evaluate=False):
+        '''
+        Checks whether the rule passes the :threshold: on :pairs:, streaming the counts word by word and stopping as soon as the outcome is decided (see utils.tolerance_bounds()):
+        a word can have at most as many applications as target segments, which bounds the applications still to come.
+        The bounds are specific to the Tolerance Principle, so any other :threshold: is checked after counting all of the words.
+        This is the bounded counterpart of get_n_c(): the counts are only complete if the outcome is decided by the last word.
+
+        :pairs: a Corpus or an iterable of (uf, sf) pairs
+        :memo: (optional) see evaluate_many(), for a Corpus
+        :evaluate: (optional) for a Corpus, whether to also return the RuleEvaluation on all of the pairs unless the rule fails,
+                   which reuses the changes found before stopping
+
+        :return: whether the rule passes, and the n and c counted before stopping (followed by the RuleEvaluation or None, if :evaluate:)
+        '''
+        if threshold is not tolerance_principle:
+            evaluation = self.evaluate_many(pairs, memo=memo) if type(pairs) is Corpus else None
+            n, c = (evaluation.n, evaluation.c) if evaluation is not None else self.get_n_c(pairs)
+            passed = threshold(n=n, c=c)
+            return (passed, n, c, evaluation if passed else None) if evaluate else (passed, n, c)
+        if type(pairs) is Corpus:
+            return self._verify_corpus(pairs, memo, evaluate)
+        compiled = self.compile()
+        unknown_id = self.seginv.get_id(UNKNOWN_CHAR)
+        target = compiled.target
+        pairs = list(pairs)
+        for uf, sf in pairs:
+            self.seginv.add_segments_from_str(f'{uf}')
+            self.seginv.add_segments_from_str(f'{sf}')
+        num_targets = list(sum(1 for seg_id in compiled.ids(uf) if target[seg_id]) for uf, _ in pairs)
+        n, c, remaining = 0, 0, sum(num_targets)
+        passed = tolerance_bounds(n, c, remaining)
+        for (uf, sf), uf_targets in zip(pairs, num_targets):
+            if passed is not None: # decided by the last word, once nothing remains
+                break
+            if uf_targets > 0:
+                sf_ids = compiled.ids(sf)
+                changes = compiled.change_ids(uf)
+                n, remaining = n + len(changes), remaining - uf_targets
+                c += sum(1 for idx, new_id in changes if sf_ids[idx] == (new_id if new_id is not None else unknown_id))
+                passed = tolerance_bounds(n, c, remaining)
+        return passed, n, c
+
+    def _verify_corpus(self, corpus, memo, evaluate):
+        '''
+        verify() on a :corpus:, where the number of targets in each uf is cached on the corpus (see Corpus.count_segments()).
+        '''
+        compiled = self.compile()
+        rule_key = (compiled.key, self.seginv.version)
+        unknown_id = self.seginv.get_id(UNKNOWN_CHAR)
+        pair_idxs = corpus.pairs_with(compiled.target_ids()).tolist()
+        num_targets, remaining = corpus.count_segments(compiled.target_mask)
+        app_pair_idxs, positions, new_ids = list(), list(), list()
+        n, c = 0, 0
+        passed = tolerance_bounds(n, c, remaining)
+        num_checked = 0
+        for pair_idx in pair_idxs:
+            if passed is not None: # decided by the last word, once nothing remains
+                break
+            start = corpus.offsets[pair_idx]
+            for idx, new_id in self._changes(corpus.uf_at(pair_idx), rule_key, memo):
+                new_id = new_id if new_id is not None else unknown_id
+                app_pair_idxs.append(pair_idx)
+                positions.append(idx)
+                new_ids.append(new_id)
+                n += 1
+                c += int(corpus.sf[start + idx] == new_id)
+            remaining -= int(num_targets[pair_idx])
+            passed = tolerance_bounds(n, c, remaining)
+            num_checked += 1
+        if not evaluate:
+            return passed, n, c
+        if not passed:
+            return passed, n, c, None
+        for pair_idx in pair_idxs[num_checked:]: # the pairs after the outcome was decided
+            for idx, new_id in self._changes(corpus.uf_at(pair_idx), rule_key, memo):
+                app_pair_idxs.append(pair_idx)
+                positions.append(idx)
+                new_ids.append(new_id if new_id is not None else unknown_id)
+        return passed, n, c, RuleEvaluation(corpus, self.seginv, app_pair_idxs, positions, new_ids)
+
+    def reevaluate(self, evaluation, changed_mask, memo=None):
+        '''
+        Evaluates the rule after its (non-empty) context changed, given its :evaluation: before the change.
+        Only the pairs whose changes can differ are re-evaluated. Up to the first context check whose outcome changed, the old and new scans are identical,
+        and that check reads the segment next to a target on the tier (on the side of the context), which is either
+         - a segment of the uf whose membership in the context changed, found as a site in the tier projection of the corpus (see Tier.project_many()),
+         - or a segment that a change in the old :evaluation: wrote onto the tier.
+        After a change writes an off-tier segment, the scan also visits that segment's later occurrences and no longer reads strict tier neighbours.
+        So for the pairs where the old :evaluation: wrote such a segment, every pair whose uf contains a changed segment is re-evaluated.
+
+        :evaluation: the RuleEvaluation of the rule (on some corpus) before its context changed
+        :changed_mask: a bitmask over the ids of the segments that were added to or removed from the context
+        :memo: (optional) see evaluate_many()
+
+        :return: a RuleEvaluation identical to self.evaluate_many(evaluation.corpus)
+        '''
+        corpus = evaluation.corpus
+        compiled = self.compile()
+        if compiled.lc is None and compiled.rc is None: # the rule has no context (see CompiledRule)
+            return self.evaluate_many(corpus, memo=memo)
+        rule_key = (compiled.key, self.seginv.version)
+        changed = list(self.seginv._ids(changed_mask))
+        is_changed = np.zeros(len(compiled.target), dtype=bool)
+        is_changed[changed] = True
+        is_target = np.array(compiled.target, dtype=bool)
+
+        # the sites where a changed segment is next to a target on the tier
+        proj = self.tier.project_many(corpus)
+        uf = proj.uf
+        is_start = np.zeros(len(uf) + 1, dtype=bool)
+        is_start[proj.offsets] = True
+        if compiled.lc is not None: # the segment to the left of a target
+            sites = np.flatnonzero(is_changed[uf[:-1]] & is_target[uf[1:]] & ~is_start[1:len(uf)]) + 1
+        else: # the segment to the right of a target
+            sites = np.flatnonzero(is_target[uf[:-1]] & is_changed[uf[1:]] & ~is_start[1:len(uf)])
+        site_pairs = np.searchsorted(proj.offsets, sites, side='right') - 1
+        # the pairs where the old evaluation wrote a changed segment, or wrote an off-tier segment and so may read beyond tier neighbours
+        wrote_changed = evaluation.pair_idxs[is_changed[evaluation.new_ids]]
+        wrote_off_tier = np.intersect1d(np.unique(evaluation.pair_idxs[~self.tier.member[evaluation.new_ids]]), corpus.pairs_with(changed), assume_unique=True)
+        affected = np.union1d(np.union1d(site_pairs, wrote_changed), wrote_off_tier)
+
+        delta = self._evaluate_pairs(corpus, affected.tolist(), rule_key, memo)
+        keep = ~np.isin(evaluation.pair_idxs, affected)
+        pair_idxs = np.concatenate((evaluation.pair_idxs[keep], delta.pair_idxs))
+        order = np.argsort(pair_idxs, kind='stable') # within a pair, the changes stay in the order they were made
+        return RuleEvaluation(corpus, self.seginv, pair_idxs[order],
+                              np.concatenate((evaluation.positions[keep], delta.positions))[order],
+                              np.concatenate((evaluation.new_ids[keep], delta.new_ids))[order])
+
+    def _evaluate_pairs(self, corpus, pair_idxs, rule_key, memo):
+        '''
+        :return: a RuleEvaluation of the rule on the pairs of :corpus: at :pair_idxs:
+        '''
+        unknown_id = self.seginv.get_id(UNKNOWN_CHAR)
+        app_pair_idxs, positions, new_ids = list(), list(), list()
+        for pair_idx in pair_idxs:
+            for idx, new_id in self._changes(corpus.uf_at(pair_idx), rule_key, memo):
+                app_pair_idxs.append(pair_idx)
+                positions.append(idx)
+                new_ids.append(new_id if new_id is not None else unknown_id)
+        return RuleEvaluation(corpus, self.seginv, app_pair_idxs, positions, new_ids)
+
+    def _changes(self, uf, rule_key, memo):
+        '''
+        :return: the changes of the compiled rule to the encoded :uf:, looked up in (or added to) the :memo: if there is one
+        '''
+        if memo is None:
+            return self.compile().change_ids(uf)
+        changes = memo.get((rule_key, uf))
+        if changes is None:
+            changes = tuple(self.compile().change_ids(uf))
+            memo.put((rule_key, uf), changes)
+        return changes
+
     def get_n_c(self, pairs):
+        if type(pairs) is Corpus:
+            evaluation = self.evaluate_many(pairs)
+            return evaluation.n, evaluation.c
         n, c = 0, 0
+        compiled = self.compile()
+        unknown_id = self.seginv.get_id(UNKNOWN_CHAR)
         for uf, sf in pairs:
             self.seginv.add_segments_from_str(f'{uf}')
             self.seginv.add_segments_from_str(f'{sf}')
-            changes = self.get_changes(uf)
-            for idx, change in changes:
+            sf_ids = compiled.ids(sf)
+            for idx, new_id in compiled.change_ids(uf):
                 n += 1
-                if sf[idx] == change:
+                if sf_ids[idx] == (new_id if new_id is not None else unknown_id):
                     c += 1
         return n, c
 
     def get_apps(self, pairs):
+        if type(pairs) is Corpus:
+            return self.evaluate_many(pairs).get_apps()
         apps = list()
         for uf, _ in pairs:
             changes = self.get_changes(uf)
@@ -141,6 +299,8 @@ class Rule:
         return apps
 
     def accuracy(self, pairs):
+        if type(pairs) is Corpus:
+            return self.evaluate_many(pairs).accuracy()
         n, c = self.get_n_c(pairs)
         return c / n if n > 0 else 0
 
@@ -153,4 +313,135 @@ class Rule:
         return not self.__eq__(other)
 
     def __hash__(self):
-        return hash(self.__str__())
\ No newline at end of file
+        return hash(self.__str__())
+
+class RuleEvaluation:
+    '''
+    The result of applying a rule to every pair in a Corpus (see Rule.evaluate_many()). Each application (i.e., change) is stored in parallel arrays:
+     - self.pair_idxs: the index of the pair in the corpus
+     - self.positions: the position of the change in the uf
+     - self.new_ids: the id of the segment the rule changes it to (the id of UNKNOWN_CHAR if no such segment exists)
+     - self.correct: whether that is the segment at that position of the sf
+    and self.word_n and self.word_c hold the number of applications and correct applications per pair.
+    '''
+    def __init__(self, corpus, seginv, pair_idxs, positions, new_ids):
+        self.corpus = corpus
+        self.seginv = seginv
+        self.unknown_id = seginv.get_id(UNKNOWN_CHAR)
+        self.pair_idxs = np.array(pair_idxs, dtype=np.int64)
+        self.positions = np.array(positions, dtype=np.int64)
+        self.new_ids = np.array(new_ids, dtype=np.int64)
+        self.correct = corpus.sf[corpus.offsets[self.pair_idxs] + self.positions] == self.new_ids
+        self.word_n = np.bincount(self.pair_idxs, minlength=len(corpus))
+        self.word_c = np.bincount(self.pair_idxs, weights=self.correct, minlength=len(corpus)).astype(np.int64)
+        self.n = len(self.new_ids)
+        self.c = int(self.correct.sum())
+
+    def accuracy(self):
+        return self.c / self.n if self.n > 0 else 0
+
+    def get_apps(self):
+        '''
+        :return: a list of (uf, idx, change) tuples (see Rule.get_apps())
+        '''
+        get_segment = self.seginv.get_segment
+        ufs = dict((pair_idx, self.corpus.uf_at(pair_idx)) for pair_idx in np.unique(self.pair_idxs).tolist()) # one uf per pair, shared by its applications
+        return list((ufs[pair_idx], idx, get_segment(new_id) if new_id != self.unknown_id else UNKNOWN_CHAR)
+                    for pair_idx, idx, new_id in zip(self.pair_idxs.tolist(), self.positions.tolist(), self.new_ids.tolist()))
+
+class CompiledRule:
+    '''
+    A Rule compiled to lookup tables over segment ids: lists marking which segments are in its target and context,
+    and the inventory's transition table, which maps (seg_id, ctx_id) to the id of the new segment.
+    The changes are computed by a single scan over the tier in the direction of the rule, and are identical to the Rule's.
+    '''
+    def __init__(self, rule):
+        self.seginv = rule.seginv
+        self.tier = rule.tier
+        self.feats = rule.feats
+        self.underspec = rule.underspec
+        self.assimilate = rule.assimilate
+        self.target_mask = self.seginv.table_mask(rule.target)
+        lc_mask = self.seginv.table_mask(rule.lc) if rule.lc else None
+        rc_mask = self.seginv.table_mask(rule.rc) if rule.rc else None
+        self.target = self.seginv.membership(self.target_mask)
+        # a context is only used if it is non-empty
+        self.lc = self.seginv.membership(lc_mask) if lc_mask is not None else None
+        self.rc = self.seginv.membership(rc_mask) if rc_mask is not None else None
+        self.left_to_right = rule.lc is not None
+        # a canonical form of the rule: any two rules with the same key make the same changes
+        self.key = ('rule', tuple(self.feats), self.underspec, self.assimilate, self.target_mask, lc_mask, rc_mask, self.left_to_right, self.tier.mask)
+
+    def target_ids(self):
+        '''
+        :return: the ids of the segments in the target; the rule only changes words that contain one of them
+        '''
+        return list(seg_id for seg_id, in_target in enumerate(self.target) if in_target)
+
+    def ids(self, s):
+        '''
+        :return: the ids of the segments of :s:
+        '''
+        if type(s) is EncodedSequence and s.seginv.table is self.seginv.table:
+            return s.ids
+        get_id = self.seginv.get_id
+        return list(get_id(seg) for seg in s)
+
+    def get_changes(self, s):
+        '''
+        :return: the changes (see Rule.get_changes()) to the sequence :s:
+        '''
+        get_segment = self.seginv.get_segment
+        return list((idx, get_segment(new_id) if new_id is not None else UNKNOWN_CHAR) for idx, new_id in self.change_ids(s))
+
+    def change_ids(self, s):
+        '''
+        :return: a list of (idx, new_id) tuples, where new_id is the id of the segment that the idx position of :s: changes to (or None if no such segment exists)
+        '''
+        ids = self.ids(s)
+        tier_seq, positions = self.tier.project_ids(ids, key=s if type(s) is EncodedSequence else None) # the ids on the tier and their positions in :s:
+        tier_seq = list(tier_seq) # changes are written onto the tier, so copy the (possibly cached) projection
+        member, target, lc, rc = self.tier._member, self.target, self.lc, self.rc
+        table = self.seginv.transition_table(self.feats, self.underspec, assimilate=self.assimilate)
+
+        changes = list()
+        left_to_right = self.left_to_right
+        step = 1 if left_to_right else -1
+        tier_ptr = 0 if left_to_right else len(tier_seq) - 1 # a pointer that keeps track of where on the tier we are
+        # ids of off-tier segments that have been written onto the tier; since changes are applied to the tier sequentially,
+        # a later occurrence of such a segment in :s: also counts as on the tier
+        written = set()
+
+        def visit(seq_ptr):
+            nonlocal tier_ptr
+            seg_id = ids[seq_ptr]
+            new_id = False # False if the window does not match the rule
+            if lc is None and rc is None: # no context
+                if target[seg_id]:
+                    new_id = seg_id # assimilate with self (i.e., no change)
+            elif lc is not None:
+                if tier_ptr > 0 and lc[tier_seq[tier_ptr - 1]] and target[seg_id]: # left context
+                    new_id = table[seg_id, tier_seq[tier_ptr - 1]] # assimilate left
+            elif tier_ptr < len(tier_seq) - 1 and target[seg_id] and rc[tier_seq[tier_ptr + 1]]: # right context
+                new_id = table[seg_id, tier_seq[tier_ptr + 1]] # assimilate right
+            if new_id is not False:
+                changes.append((seq_ptr, new_id)) # add change to those that need to be made
+                if new_id is not None:
+                    tier_seq[tier_ptr] = new_id # apply sequentially by updating tier with change too
+                    if not member[new_id]:
+                        written.add(new_id)
+            tier_ptr += step # move forward on tier
+
+        prev = -1 if left_to_right else len(ids) # the last position of :s: that was visited
+        for seq_ptr in (positions if left_to_right else reversed(positions)):
+            if written: # check the off-tier positions in between
+                for skipped in range(prev + step, seq_ptr, step):
+                    if ids[skipped] in written:
+                        visit(skipped)
+            visit(seq_ptr)
+            prev = seq_ptr
+        if written:
+            for skipped in range(prev + step, len(ids) if left_to_right else -1, step):
+                if ids[skipped] in written:
+                    visit(skipped)
+        return changes
@@ -1,13 +1,27 @@
 class Segment:
     '''
     Class representing a Segment as a vector of features, which simultaneously behaves like an IPA str.
+
+    A SegmentInventory creates exactly one Segment per segment and gives it the integer :seg_id: of its row in the feature table,
+    so equal Segments from the same inventory are usually the same object. Equality and hashing still follow the IPA str, 
+    so that Segments and strs remain interchangeable (e.g., as members of the same set).
     '''
-    def __init__(self, ipa, feature_vec=[]):
+    __slots__ = ('ipa', 'feature_vec', 'id')
+
+    def __init__(self, ipa, feature_vec=[], seg_id=None):
         self.ipa = ipa
         self.feature_vec = feature_vec
+        self.id = seg_id
 
     def __eq__(self, other):
-        return f'{self}' == f'{other}'
+        if self is other: # interned segments
+            return True
+        typ = type(other)
+        if typ is Segment:
+            return self.ipa == other.ipa
+        if typ is str:
+            return self.ipa == other
+        return self.ipa == f'{other}'
 
     def __neq__(self, other):
         return not self.__eq__(other)
@@ -27,6 +41,13 @@ class Segment:
     def __hash__(self):
         return hash(self.ipa)
 
+    # Segments are interned by their SegmentInventory, so copies share the original object
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
     def __str__(self):
         return self.ipa
 
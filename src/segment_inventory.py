@@ -1,40 +1,64 @@
 import os
+import threading
+from contextlib import contextmanager, nullcontext
 from collections import defaultdict
 from itertools import product as catesian_product
 from segment import Segment
 from natural_class import NaturalClass
+from feature_table import FeatureTable, FEAT_VAL_TO_CODE, CODE_TO_FEAT_VAL
 from utils import SYLLABLE_BOUNDARY, UNKNOWN_CHAR
 
 class SegmentInventory:
     '''
     A class for working with feature-bundle representations of segments.
+
+    The parsed feature file is an immutable FeatureTable shared by all inventories built from the same file: every row has a dense integer id
+    and the feature values are stored in an int8 matrix (segments x features). The inventory tracks which of those segments have been added,
+    mapping the vectors of added segments back to their ids through a tuple-keyed dict. The str-based API is implemented on top of these.
     '''
     def __init__(self,
                  ipa_file='../data/ipa.txt',
                  segs=None,
-                 add_segs=False):
+                 add_segs=False,
+                 use_cache=True,
+                 lazy=False):
 
-        self.segments = set()
+        self.lazy = lazy # if True, Segment objects are only created when first accessed
+        self._segments = set()
         dir_path = os.path.dirname(os.path.realpath(__file__))
 
-        self.seg_to_feats = dict()
-        with open(f'{dir_path}/{ipa_file}', 'r') as f:
-            for i, line in enumerate(f):
-                line = line.strip().split('\t')
-                seg, feats = line[0], line[1:]
-                if i == 0:
-                    self.feature_space = feats
-                else:
-                    self.seg_to_feats[seg] = feats
-
-        self.seg_to_feats[UNKNOWN_CHAR] = ['?'] * len(self.feature_space)
-
-        self.ipa_to_segment = dict()
-        self.feats_to_segment = dict()
+        self.table_path = os.path.realpath(f'{dir_path}/{ipa_file}')
+        self.table = FeatureTable.load(self.table_path, use_cache=use_cache)
+        self.feature_space = self.table.feature_space
+        self.seg_to_feats = self.table.seg_to_feats
+        self.feat_to_idx = self.table.feat_to_idx
+        self.id_to_ipa = self.table.id_to_ipa
+        self.ipa_to_id = self.table.ipa_to_id
+        self.feature_matrix = self.table.feature_matrix
+        self._vecs = self.table.vecs
+        self._feat_masks = self.table.feat_masks
+        self._all_mask = self.table.all_mask
+        self._seg_feat_bits = self.table.seg_feat_bits
+
+        self.ipa_to_segment = dict() # maps the ipa of each Segment object created so far to the object
+        self.vec_to_id = dict() # maps the feature vectors of segments in the inventory to their ids
+        self._id_to_segment = [None] * len(self.table)
+        self._size = 0 # the number of segments in the inventory
+
+        self.active_mask = 0 # bitmask over the ids of the segments in the inventory
+        self.version = 0 # incremented every time the inventory grows
+        self._class_masks = dict() # frozenset of features (or '*') -> bitmask
+        self._extension_strs = dict() # frozenset of features (or '*') -> (version, extension str)
+        self._transitions = dict() # (feats, only_underspec, operator) -> TransitionTable
 
         if segs:
             self.add_segments(segs)
-        if add_segs:
+        if add_segs and lazy: # index every row of the feature file without creating any Segment objects
+            self.active_mask = self._all_mask
+            self.vec_to_id = self.table.vec_to_id
+            self._size = len(self.table)
+            self.version += 1
+        elif add_segs:
             segs = set(self.seg_to_feats.keys())
             self.add_segments(segs)
 
@@ -45,13 +69,49 @@ class SegmentInventory:
             return True
         if ipa_seg == SYLLABLE_BOUNDARY:
             return False
-        feature_vec = self.seg_to_feats[ipa_seg]
-        seg = Segment(ipa_seg, feature_vec)
-        self.segments.add(seg)
-        self.feats_to_segment[','.join(str(f) for f in seg.feature_vec)] = seg
-        self.ipa_to_segment[f'{seg}'] = seg
+        seg_id = self.ipa_to_id[f'{ipa_seg}']
+        self.vec_to_id[self._vecs[seg_id]] = seg_id
+        self.active_mask |= 1 << seg_id
+        self._size += 1
+        if not self.lazy:
+            self._materialize(seg_id)
+        self.version += 1
+        self._transitions.clear() # results may map to the new segment, so the tables are stale
         return True
 
+    def _materialize(self, seg_id):
+        '''
+        Creates the Segment object for the segment with id :seg_id:
+        '''
+        ipa = self.id_to_ipa[seg_id]
+        seg = Segment(ipa, self.seg_to_feats[ipa], seg_id)
+        self._segments.add(seg)
+        self.ipa_to_segment[ipa] = seg
+        self._id_to_segment[seg_id] = seg
+        return seg
+
+    @property
+    def segments(self):
+        '''
+        :return: the set of Segment objects in the inventory (in lazy mode, this creates any that have not been accessed yet)
+        '''
+        if len(self._segments) < self._size:
+            for seg_id in self._ids(self.active_mask):
+                if self._id_to_segment[seg_id] is None:
+                    self._materialize(seg_id)
+        return self._segments
+
+    def _ids(self, mask):
+        '''
+        :mask: a bitmask over segment ids
+
+        :return: a generator over the ids in :mask:
+        '''
+        while mask:
+            low = mask & -mask
+            yield low.bit_length() - 1
+            mask ^= low
+
     def add_segments(self, segments):
         for ipa in segments:
             self.add_segment(ipa)
@@ -63,27 +123,104 @@ class SegmentInventory:
                 continue
             self.add_segment(seg)
 
-    def _add_or_remove_feats(self, seg, feats, add=True):
+    def get_id(self, seg):
         '''
         :seg: a segment (in any format supported by __getitem__)
+
+        :return: the integer id of :seg:
+        '''
+        seg_id = self._lookup_id(seg)
+        if seg_id is None:
+            raise KeyError(f'"{seg}" is not in the segment inventory.')
+        return seg_id
+
+    def get_segment(self, seg_id):
+        '''
+        :seg_id: the integer id of a segment in the inventory
+
+        :return: the Segment object with id :seg_id:
+        '''
+        seg = self._id_to_segment[seg_id]
+        if seg is None:
+            seg = self._materialize(seg_id)
+        return seg
+
+    def _lookup_id(self, key):
+        '''
+        :key: a segment (in any format supported by __getitem__)
+
+        :return: the id of the segment corresponding to :key: if it is in the inventory, otherwise None
+        '''
+        typ = type(key)
+        if typ is Segment:
+            seg_id = key.id
+            if seg_id is not None and seg_id < len(self._id_to_segment) and self._id_to_segment[seg_id] is key: # one of this inventory's Segments
+                return seg_id
+            key = key.ipa
+            typ = str
+        if typ is str and ',' not in key:
+            seg_id = self.ipa_to_id.get(key)
+            return seg_id if seg_id is not None and self._is_active(seg_id) else None
+        if typ is str:
+            key = key.split(',')
+            typ = list
+        if typ is list or typ is tuple:
+            try:
+                vec = tuple(FEAT_VAL_TO_CODE[f'{val}'] for val in key)
+            except KeyError:
+                return None
+            return self._vec_lookup(vec)
+        return None
+
+    def _is_active(self, seg_id):
+        '''
+        :return: True if the segment with id :seg_id: is in the inventory
+        '''
+        return (self.active_mask >> seg_id) & 1 == 1
+
+    def _vec_lookup(self, vec):
+        '''
+        :vec: a tuple of integer feature codes
+
+        :return: the id of the segment in the inventory with the feature vector :vec:, otherwise None
+        '''
+        return self.vec_to_id.get(vec)
+
+    def _feat_idxs(self, feats):
+        '''
         :feats: a feature (string) or iterable of features (e.g., list of strings)
 
-        :return: the segment with the same features as :seg: plus/minus those in :feats:, if such a segment exists 
+        :return: a tuple of the indices of :feats: in the feature space
         '''
-        seg = self[seg]
         if type(feats) is str:
             feats = (feats,)
-        if not add and not all(seg.feature_vec[self.feature_space.index(feat)] for feat in feats):
-            return None
-        new_feat_vec = list(seg.feature_vec)
-        for feat in feats:
-            feat_index = self.feature_space.index(feat)
-            new_feat_vec[feat_index] = '+' if add else '-'
-        if new_feat_vec not in self:
+        return tuple(self.feat_to_idx[feat] for feat in feats)
+
+    def _segment_from_vec(self, vec):
+        '''
+        :vec: a feature vector of integer codes
+
+        :return: the Segment with the feature vector :vec:, if such a segment exists, otherwise None
+        '''
+        seg_id = self._vec_lookup(tuple(vec))
+        if seg_id is None:
             return None
-        if new_feat_vec == list(seg.feature_vec): # if the vector is unchanged, return None
+        return self.get_segment(seg_id)
+
+    def _add_or_remove_feats(self, seg, feats, add=True):
+        '''
+        :seg: a segment (in any format supported by __getitem__)
+        :feats: a feature (string) or iterable of features (e.g., list of strings)
+
+        :return: the segment with the same features as :seg: plus/minus those in :feats:, if such a segment exists 
+        '''
+        vec = self._vecs[self.get_id(seg)]
+        new_vec = list(vec)
+        for feat_idx in self._feat_idxs(feats):
+            new_vec[feat_idx] = 1 if add else -1
+        if tuple(new_vec) == vec: # if the vector is unchanged, return None
             return None
-        return self[new_feat_vec]
+        return self._segment_from_vec(new_vec)
 
     def without_feats(self, seg, feats):
         '''
@@ -113,14 +250,10 @@ class SegmentInventory:
         '''
         if len(feats) != len(vals):
             raise ValueError(f'Length of :feats: and :vals: must be equal, but are |feats| = {len(feats)} and |vals| = {len(vals)}')
-        seg = self[seg]
-        new_feat_vec = list(seg.feature_vec)
-        for feat, val in zip(feats, vals):
-            feat_idx = self.feature_space.index(feat)
-            new_feat_vec[feat_idx] = val
-        if new_feat_vec not in self:
-            return None
-        return self[new_feat_vec]
+        new_vec = list(self._vecs[self.get_id(seg)])
+        for feat_idx, val in zip(self._feat_idxs(feats), vals):
+            new_vec[feat_idx] = FEAT_VAL_TO_CODE[val]
+        return self._segment_from_vec(new_vec)
 
     def permute(self, seg, feats, only_underspec=True):
         '''
@@ -129,22 +262,84 @@ class SegmentInventory:
 
         :return: all possible forms of the segment formed by permuting the values of :feats:
         '''
-        seg = self[seg]
+        vec = self._vecs[self.get_id(seg)]
 
         opts = list()
-        for feat in feats:
-            val = seg.feature_vec[self.feature_space.index(feat)]
-            if val == '?' or not only_underspec:
-                opts.append(['+', '-'])
+        for feat_idx in self._feat_idxs(feats):
+            val = vec[feat_idx]
+            if val == 0 or not only_underspec:
+                opts.append([1, -1])
             else:
                 opts.append([val])
 
         forms = set()
+        feat_idxs = self._feat_idxs(feats)
         for opt in list(catesian_product(*opts)):
-            forms.add(self.set_feats(seg, feats, opt))
+            new_vec = list(vec)
+            for feat_idx, val in zip(feat_idxs, opt):
+                new_vec[feat_idx] = val
+            forms.add(self._segment_from_vec(new_vec))
         forms.discard(None)
         return forms
 
+    def transition_table(self, feats, only_underspec, assimilate=True):
+        '''
+        :feats: a feature (string) or iterable of features (e.g., list of strings)
+        :only_underspec: if True, only (dis)similate feats that are underspecified for the segment
+        :assimilate: if True, the table is for assimilation, otherwise for dissimilation
+
+        :return: a TransitionTable mapping (seg_id, tgt_id) to the id of the (dis)similated segment (or None if no such segment exists).
+                 The table is filled lazily and discarded when the inventory grows, so it should not be held onto across additions.
+        '''
+        if type(feats) is str: # convert feats to tuple
+            feats = (feats,)
+        key = (tuple(feats), only_underspec, 'assimilate' if assimilate else 'dissimilate')
+        return self._table(key, lambda: TransitionTable(self, self._feat_idxs(feats), only_underspec, assimilate))
+
+    def set_feats_table(self, feats, vals):
+        '''
+        :feats: an iterable of features (e.g., list of strings)
+        :vals: an iterable of values (e.g., list of values) - must be the same length as :feats:
+
+        :return: a TransitionTable mapping seg_id to the id of the segment with the :feats: of seg set to :vals: (or None if no such segment exists).
+                 Like transition_table(), it is filled lazily and discarded when the inventory grows.
+        '''
+        if len(feats) != len(vals):
+            raise ValueError(f'Length of :feats: and :vals: must be equal, but are |feats| = {len(feats)} and |vals| = {len(vals)}')
+        key = (tuple(feats), tuple(vals), 'set')
+        return self._table(key, lambda: TransitionTable(self, self._feat_idxs(feats), False, True, codes=tuple(FEAT_VAL_TO_CODE[val] for val in vals)))
+
+    def _table(self, key, build):
+        '''
+        :return: the memoized table for :key:, which is created by calling :build: if there is none
+        '''
+        table = self._transitions.get(key)
+        if table is None:
+            table = build()
+            self._transitions[key] = table
+        return table
+
+    def _set_codes(self, seg_id, feat_idxs, codes):
+        '''
+        :return: the id of the segment :seg_id: with the features at :feat_idxs: set to :codes:
+        '''
+        new_vec = list(self._vecs[seg_id])
+        for feat_idx, code in zip(feat_idxs, codes):
+            new_vec[feat_idx] = code
+        return self._vec_lookup(tuple(new_vec))
+
+    def _transition(self, seg_id, tgt_id, feat_idxs, only_underspec, assimilate):
+        '''
+        :return: the id of the segment :seg_id: with the values of the features at :feat_idxs: set to match (or not match) those of :tgt_id:
+        '''
+        new_vec = list(self._vecs[seg_id])
+        tgt_vec = self._vecs[tgt_id]
+        for feat_idx in feat_idxs: # iterate over feats
+            if not only_underspec or new_vec[feat_idx] == 0:
+                # negating the code flips +/- and leaves ? unchanged
+                new_vec[feat_idx] = tgt_vec[feat_idx] if assimilate else -tgt_vec[feat_idx]
+        return self._vec_lookup(tuple(new_vec))
+
     def assimilate(self, seg, tgt, feats, only_underspec=True):
         '''
         :seg: a segment (in any format supported by __getitem__)
@@ -154,18 +349,8 @@ class SegmentInventory:
 
         :return: the :seg: with values of :feats: set to match those of :tgt:
         '''
-        seg = self[seg]
-        tgt = self[tgt]
-        if type(feats) is str: # convert feats to tuple
-            feats = (feats,)
-        new_feat_vec = list(seg.feature_vec)
-        for feat in feats: # iterate over feats
-            feat_idx = self.feature_space.index(feat) # get the feat's idx
-            if not only_underspec or new_feat_vec[feat_idx] == '?':
-                new_feat_vec[feat_idx] = tgt.feature_vec[feat_idx]
-        if new_feat_vec not in self:
-            return None
-        return self[new_feat_vec]
+        new_id = self.transition_table(feats, only_underspec, assimilate=True)[self.get_id(seg), self.get_id(tgt)]
+        return None if new_id is None else self.get_segment(new_id)
 
     def dissimilate(self, seg, tgt, feats, only_underspec=False):
         '''
@@ -178,27 +363,21 @@ class SegmentInventory:
 
         :return: the :seg: with values of :feats: set to NOT match those of :tgt:
         '''
-        seg = self[seg]
-        tgt = self[tgt]
-        if type(feats) is str: # convert feats to tuple
-            feats = (feats,)
-        new_feat_vec = list(seg.feature_vec)
-        for feat in feats: # iterate over feats
-            feat_idx = self.feature_space.index(feat) # get the feat's idx
-            if not only_underspec or new_feat_vec[feat_idx] == '?':
-                new_feat_vec[feat_idx] = self._negate_feat_val(tgt.feature_vec[feat_idx])
-        if new_feat_vec not in self:
-            return None
-        return self[new_feat_vec]
+        new_id = self.transition_table(feats, only_underspec, assimilate=False)[self.get_id(seg), self.get_id(tgt)]
+        return None if new_id is None else self.get_segment(new_id)
 
-    def _negate_feat_val(self, val):
-        if val == '?':
-            return val
-        if val == '+':
-            return '-'
-        if val == '-':
-            return '+'
-        raise ValueError(f'{val} is not one of +,-,?')
+    def freeze(self):
+        '''
+        :return: an immutable snapshot of the inventory (a FrozenSegmentInventory), which is safe to share across threads
+        '''
+        return FrozenSegmentInventory(self)
+
+    def session(self):
+        '''
+        A context manager wrapping a single inference call. For a mutable inventory, this does nothing; 
+        see FrozenSegmentInventory.session() for how frozen inventories handle segments they have not seen.
+        '''
+        return nullcontext(self)
 
     def __getitem__(self, key):
         '''
@@ -210,15 +389,9 @@ class SegmentInventory:
 
         :return: the Segment object corresponding to the :key: if present, otherwise None
         '''
-        typ = type(key)
-        if typ is str and ',' not in key and key in self.ipa_to_segment:
-            return self.ipa_to_segment[key]
-        elif typ is Segment:
-            return self[f'{key}']
-        elif typ is str and ',' in key and key in self.feats_to_segment:
-            return self.feats_to_segment[key]
-        elif typ is list:
-            return self[','.join(str(f) for f in key)]
+        seg_id = self._lookup_id(key)
+        if seg_id is not None:
+            return self.get_segment(seg_id)
 
         # otherwise, raise an error
         raise KeyError(f'"{key}" is not in the segment inventory.')
@@ -234,19 +407,10 @@ class SegmentInventory:
 
         :return: True if the :item: (segment) is in the segment inventory, False if not
         '''
-        typ = type(item)
-        if typ is str and ',' not in item:
-            return item in self.ipa_to_segment
-        elif typ is Segment:
-            return f'{item}' in self
-        elif typ is str and ',' in item:
-            return item in self.feats_to_segment
-        elif typ is list:
-            return ','.join(str(f) for f in item) in self
-        return False
+        return self._lookup_id(item) is not None
 
     def __str__(self):
-        return ','.join(sorted(self.ipa_to_segment.keys()))
+        return ','.join(sorted(self.id_to_ipa[seg_id] for seg_id in self._ids(self.active_mask)))
 
     def __repr__(self):
         return self.__str__()
@@ -254,33 +418,111 @@ class SegmentInventory:
     def __iter__(self):
         return self.segments.__iter__()
 
+    def extension_mask(self, nat_class):
+        '''
+        :nat_class: a set of features or a NaturalClass object
+
+        :return: a bitmask over the ids of all segments in the feature file (added or not) that are in :nat_class:
+        '''
+        if type(nat_class) is NaturalClass:
+            return nat_class.mask
+        mask = self._all_mask
+        for feat in nat_class:
+            mask &= self._feat_masks.get(feat, 0)
+        return mask
+
+    def compile_class(self, key):
+        '''
+        :key: a frozenset of features, or '*' for the class of all segments
+
+        :return: the (memoized) bitmask over the ids of all segments in the feature file that are in the class
+        '''
+        mask = self._class_masks.get(key)
+        if mask is None:
+            mask = self._all_mask if key == '*' else self.extension_mask(key)
+            self._class_masks[key] = mask
+        return mask
+
+    def extension_str(self, key):
+        '''
+        :key: a frozenset of features, or '*' for the class of all segments
+
+        :return: the sorted extension of the class as a str (e.g., '{a,e,i}'), memoized until the inventory grows
+        '''
+        memo = self._extension_strs.get(key)
+        if memo is None or memo[0] != self.version:
+            ext = self.from_mask(self.compile_class(key))
+            memo = (self.version, '{' + ','.join(sorted(f'{seg}' for seg in ext)) + '}')
+            self._extension_strs[key] = memo
+        return memo[1]
+
+    def table_mask(self, segs):
+        '''
+        :segs: a NaturalClass or a set of segments
+
+        :return: a bitmask over the ids of all segments in the feature file (added or not) that are in :segs:
+        '''
+        if type(segs) is NaturalClass:
+            return segs.mask
+        mask = 0
+        for seg in segs:
+            seg_id = self.ipa_to_id.get(f'{seg}')
+            if seg_id is not None:
+                mask |= 1 << seg_id
+        return mask
+
+    def membership(self, mask):
+        '''
+        :mask: a bitmask over segment ids
+
+        :return: a list indexed by the ids of all segments in the feature file, which is True for those in :mask:
+        '''
+        return list((mask >> seg_id) & 1 == 1 for seg_id in range(len(self.id_to_ipa)))
+
+    def get_mask(self, segs):
+        '''
+        :segs: an iterable of segments
+
+        :return: a bitmask over the ids of the :segs: that are in the inventory
+        '''
+        mask = 0
+        for seg in segs:
+            seg_id = self._lookup_id(seg)
+            if seg_id is not None:
+                mask |= 1 << seg_id
+        return mask
+
+    def from_mask(self, mask):
+        '''
+        :mask: a bitmask over segment ids
+
+        :return: the set of segments in the inventory whose ids are in :mask:
+        '''
+        return set(self.get_segment(seg_id) for seg_id in self._ids(mask & self.active_mask))
+
     def extension(self, nat_class):
         '''
         :nat_class: a set of features or a NaturalClass object
 
         :return: Extension(:nat_class:)
         '''
-        if type(nat_class) is set:
-            nat_class = NaturalClass(nat_class, self)
-        return set(filter(lambda seg: seg in nat_class, self.segments))
+        return self.from_mask(self.extension_mask(nat_class))
 
     def extension_complement(self, nat_class):
         '''
         :nat_class: a set of features or a NaturalClass object
 
-        :return: self.segments \ Extension(:nat_class:)
+        :return: self.segments \\ Extension(:nat_class:)
         '''
-        if type(nat_class) is set:
-            nat_class = NaturalClass(nat_class, self)
-        return set(filter(lambda seg: seg not in nat_class, self.segments))
+        return self.from_mask(~self.extension_mask(nat_class))
 
     def complement(self, segs):
         '''
         :segs: an iterable of segments
 
-        :return: self.segments \ segs
+        :return: self.segments \\ segs
         '''
-        return self.segments.difference(segs)
+        return self.from_mask(~self.get_mask(segs))
 
     def feat_vals(self, seg, exclude_unspec=False):
         '''
@@ -300,13 +542,23 @@ class SegmentInventory:
 
         :return: the features shared by the :segs:
         '''
-        return set.intersection(*list(self.feat_vals(seg, exclude_unspec=True) for seg in segs))
+        bits = None
+        for seg in segs:
+            seg_bits = self._seg_feat_bits[self.get_id(seg)]
+            bits = seg_bits if bits is None else bits & seg_bits
+        shared = set()
+        while bits:
+            low = bits & -bits
+            bit_idx = low.bit_length() - 1
+            shared.add(f'{"+" if bit_idx % 2 == 0 else "-"}{self.feature_space[bit_idx // 2]}')
+            bits ^= low
+        return shared
 
     def feat_diff(self, seg1, seg2):
         diff = set()
-        seg1, seg2 = self[seg1], self[seg2]
+        vec1, vec2 = self._vecs[self.get_id(seg1)], self._vecs[self.get_id(seg2)]
         for i, feat in enumerate(self.feature_space):
-            if seg1.feature_vec[i] != seg2.feature_vec[i]:
+            if vec1[i] != vec2[i]:
                 diff.add(feat)
         return diff
 
@@ -317,8 +569,7 @@ class SegmentInventory:
 
         :return: the value of :feat: for :seg:
         '''
-        seg = self[seg]
-        return seg.feature_vec[self.feature_space.index(feat)]
+        return CODE_TO_FEAT_VAL[self._vecs[self.get_id(seg)][self.feat_to_idx[feat]]]
 
     def check_unique(self):
         feature_vecs = defaultdict(set)
@@ -328,4 +579,180 @@ class SegmentInventory:
         for _, segs in feature_vecs.items():
             if len(segs) > 1:
                 conflicts.append(segs)
-        return conflicts
\ No newline at end of file
+        return conflicts
+
+class TransitionTable(dict):
+    '''
+    A lazily-filled lookup table mapping (seg_id, tgt_id) to the id of the segment that results from (dis)similating seg to tgt, or None.
+    If :codes: is given, the table instead maps seg_id to the id of seg with the features at :feat_idxs: set to :codes: (see SegmentInventory.set_feats_table()).
+    '''
+    def __init__(self, seginv, feat_idxs, only_underspec, assimilate, codes=None):
+        super().__init__()
+        self.seginv = seginv
+        self.feat_idxs = feat_idxs
+        self.only_underspec = only_underspec
+        self.assimilate = assimilate
+        self.codes = codes
+
+    def compute(self, key):
+        if self.codes is not None:
+            return self.seginv._set_codes(key, self.feat_idxs, self.codes)
+        seg_id, tgt_id = key
+        return self.seginv._transition(seg_id, tgt_id, self.feat_idxs, self.only_underspec, self.assimilate)
+
+    def __missing__(self, key):
+        new_id = self.compute(key)
+        self[key] = new_id
+        return new_id
+
+
+class FrozenTransitionTable(TransitionTable):
+    '''
+    A read-only TransitionTable: it is seeded with the entries of an existing table, and entries that are missing are computed but not stored.
+    '''
+    def __init__(self, seginv, table):
+        super().__init__(seginv, table.feat_idxs, table.only_underspec, table.assimilate, codes=table.codes)
+        self.update(table)
+
+    def __missing__(self, key):
+        return self.compute(key)
+
+
+class FrozenSegmentInventory(SegmentInventory):
+    '''
+    An immutable snapshot of a SegmentInventory (see SegmentInventory.freeze()). No method mutates the snapshot, 
+    so one snapshot (and the model that uses it) can be shared by a pool of threads or forked workers without locks.
+
+    Segments that are not in the snapshot can only be added inside a session(). They are kept in a per-thread overlay 
+    that behaves exactly like adding them to the inventory, and that is discarded when the session ends.
+    '''
+    def __init__(self, seginv):
+        self.__dict__.update(seginv.__dict__)
+        self._segments = set(seginv._segments)
+        self.ipa_to_segment = dict(seginv.ipa_to_segment)
+        self._id_to_segment = list(seginv._id_to_segment)
+        if seginv.vec_to_id is not seginv.table.vec_to_id:
+            self.vec_to_id = dict(seginv.vec_to_id)
+        self._class_masks = dict(seginv._class_masks)
+        self._extension_strs = dict(seginv._extension_strs)
+        self._transitions = dict((key, FrozenTransitionTable(self, table)) for key, table in seginv._transitions.items())
+        self._local = threading.local()
+
+    def freeze(self):
+        return self
+
+    @contextmanager
+    def session(self):
+        '''
+        A context manager wrapping a single inference call (e.g., one call to produce()), inside of which unseen segments can be added.
+        '''
+        local = self._local
+        depth = getattr(local, 'depth', 0)
+        if depth == 0:
+            local.segs = dict() # seg_id -> Segment for Segments created during this session
+            local.vec_to_id = dict()
+            local.mask = 0
+            local.transitions = dict()
+        local.depth = depth + 1
+        try:
+            yield self
+        finally:
+            local.depth -= 1
+            if local.depth == 0:
+                local.segs, local.vec_to_id, local.mask, local.transitions = None, None, 0, None
+
+    def _overlay(self):
+        '''
+        :return: this thread's session state if a session is open, otherwise None
+        '''
+        local = self._local
+        return local if getattr(local, 'depth', 0) > 0 else None
+
+    def add_segment(self, ipa_seg):
+        if ipa_seg in self:
+            return True
+        if ipa_seg == SYLLABLE_BOUNDARY:
+            return False
+        local = self._overlay()
+        if local is None:
+            raise RuntimeError(f'Cannot add "{ipa_seg}" to a frozen SegmentInventory outside of a session().')
+        seg_id = self.ipa_to_id[f'{ipa_seg}']
+        local.vec_to_id[self._vecs[seg_id]] = seg_id
+        local.mask |= 1 << seg_id
+        local.transitions.clear()
+        return True
+
+    def _is_active(self, seg_id):
+        if (self.active_mask >> seg_id) & 1:
+            return True
+        local = self._overlay()
+        return local is not None and (local.mask >> seg_id) & 1 == 1
+
+    def _vec_lookup(self, vec):
+        local = self._overlay()
+        if local is not None and vec in local.vec_to_id: # segments added during the session were added last
+            return local.vec_to_id[vec]
+        return self.vec_to_id.get(vec)
+
+    def get_segment(self, seg_id):
+        seg = self._id_to_segment[seg_id]
+        if seg is not None:
+            return seg
+        local = self._overlay()
+        if local is not None and seg_id in local.segs:
+            return local.segs[seg_id]
+        ipa = self.id_to_ipa[seg_id]
+        seg = Segment(ipa, self.seg_to_feats[ipa], seg_id)
+        if local is not None:
+            local.segs[seg_id] = seg
+        return seg
+
+    @property
+    def segments(self):
+        '''
+        :return: the set of Segment objects in the snapshot, including those added during this thread's session()
+        '''
+        local = self._overlay()
+        if len(self._segments) < self._size or (local is not None and local.mask):
+            return self.from_mask(self.active_mask | (local.mask if local is not None else 0))
+        return self._segments
+
+    def from_mask(self, mask):
+        local = self._overlay()
+        active_mask = self.active_mask | (local.mask if local is not None else 0)
+        return set(self.get_segment(seg_id) for seg_id in self._ids(mask & active_mask))
+
+    def _table(self, key, build):
+        local = self._overlay()
+        if local is not None and local.mask: # unseen segments can change results, so use a table private to the session
+            table = local.transitions.get(key)
+            if table is None:
+                table = build()
+                local.transitions[key] = table
+            return table
+        table = self._transitions.get(key)
+        if table is None:
+            table = FrozenTransitionTable(self, build())
+        return table
+
+    def compile_class(self, key):
+        mask = self._class_masks.get(key)
+        if mask is None:
+            mask = self._all_mask if key == '*' else self.extension_mask(key)
+        return mask
+
+    def extension_str(self, key):
+        memo = self._extension_strs.get(key)
+        if self._overlay() is None and memo is not None and memo[0] == self.version:
+            return memo[1]
+        ext = self.from_mask(self.compile_class(key))
+        return '{' + ','.join(sorted(f'{seg}' for seg in ext)) + '}'
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state['_local'] # thread-local state cannot be pickled, and belongs to the sending thread anyway
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
\ No newline at end of file
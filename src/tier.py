@@ -1,28 +1,82 @@
+from collections import defaultdict
+import numpy as np
+
 from sequence import Sequence
+from encoded_sequence import EncodedSequence
 
 class Tier:
     '''
     Tier object.
     '''
-    def __init__(self, tierset, seginv):
+    def __init__(self, tierset, seginv, cache=None):
+        '''
+        :cache: (optional) an LRUCache of projections, which can be shared by any tiers over :seginv:
+        '''
         self.tierset = tierset
         self.seginv = seginv
+        self.cache = cache
         self.delset = self.seginv.complement(tierset) if type(tierset) is set else self.seginv.extension_complement(tierset)
+        self._compile()
+
+    def _compile(self):
+        '''
+        Compiles the tierset to a bitmask over the ids of all segments in the feature file (self.mask),
+        and to a boolean array indexed by segment id (self.member) for projecting arrays of ids.
+        '''
+        self.mask = self.seginv.table_mask(self.tierset)
+        self._member = self.seginv.membership(self.mask)
+        self.member = np.array(self._member, dtype=bool)
+
+    def _on_tier(self, seg):
+        seg_id = self.seginv.ipa_to_id.get(f'{seg}')
+        return self._member[seg_id] if seg_id is not None else seg in self.tierset
 
     def project(self, uf, sf=None):
-        uf_tier = Sequence('', self.seginv)
-        if sf:
-            sf_tier = Sequence('', self.seginv)
-        for i in range(len(uf)):
-            seg = uf[i]
-            if seg in self.tierset:
-                uf_tier += seg
-                if sf:
-                    sf_tier += sf[i]
+        keep = list(i for i in range(len(uf)) if self._on_tier(uf[i]))
+        uf_tier = Sequence(list(uf[i] for i in keep), self.seginv)
         if sf:
+            sf_tier = Sequence(list(sf[i] for i in keep), self.seginv)
             return uf_tier, sf_tier
         return uf_tier
 
+    def project_ids(self, ids, key=None):
+        '''
+        :ids: a sequence of segment ids (e.g., EncodedSequence.ids)
+        :key: (optional) a hashable, immutable key for :ids: (e.g., the EncodedSequence), under which the projection is cached
+
+        :return: the ids on the tier and, for each, its position in :ids: (as tuples, which are shared with the cache)
+        '''
+        if self.cache is not None and key is not None:
+            proj = self.cache.get((self.mask, key))
+            if proj is None:
+                proj = self._project_ids(ids)
+                self.cache.put((self.mask, key), proj)
+            return proj
+        return self._project_ids(ids)
+
+    def _project_ids(self, ids):
+        member = self._member
+        positions = tuple(i for i, seg_id in enumerate(ids) if member[seg_id])
+        return tuple(ids[i] for i in positions), positions
+
+    def project_many(self, corpus):
+        '''
+        Projects every pair in :corpus: onto the tier at once.
+
+        :corpus: a Corpus encoded with the same feature table as the tier
+
+        :return: a TierProjection of the corpus
+        '''
+        if self.cache is not None:
+            proj = self.cache.get((self.mask, corpus))
+            if proj is not None:
+                return proj
+        uf, offsets, positions, keep = project_ragged(corpus.uf, corpus.offsets, self.member)
+        proj = TierProjection(uf, corpus.sf[keep], offsets, positions, self.seginv)
+        if self.cache is not None:
+            self.cache.put((self.mask, corpus), proj)
+        return proj
+
     def __str__(self):
         return f'{self.tierset}' if type(self.tierset) is not set else  f'{tuple(sorted(self.tierset))}'
 
@@ -30,4 +84,101 @@ class Tier:
         return self.__str__()
 
     def __contains__(self, item):
-        return item in self.tierset
\ No newline at end of file
+        return item in self.tierset
+
+class IncrementalTier(Tier):
+    '''
+    A Tier over a fixed Corpus whose tierset can shrink. The tier of every pair is kept,
+    and removing segments from the tierset only re-projects the pairs whose tiers contain them.
+    '''
+    def __init__(self, tierset, seginv, corpus, cache=None):
+        super().__init__(set(tierset), seginv, cache=cache)
+        self.corpus = corpus
+        proj = self.project_many(corpus)
+        offsets, uf, sf = proj.offsets.tolist(), proj.uf.tolist(), proj.sf.tolist()
+        self.uf_tiers = list(uf[start:end] for start, end in zip(offsets, offsets[1:]))
+        self.sf_tiers = list(sf[start:end] for start, end in zip(offsets, offsets[1:]))
+        self._pairs_with = defaultdict(set) # maps each segment id to the indices of the pairs whose tiers contain it
+        for pair_idx, uf_tier in enumerate(self.uf_tiers):
+            for seg_id in uf_tier:
+                self._pairs_with[seg_id].add(pair_idx)
+
+    def pairs_with(self, seg_ids):
+        '''
+        :return: the indices of the pairs whose (uf) tiers contain any of the :seg_ids:
+        '''
+        return set().union(*(self._pairs_with.get(seg_id, ()) for seg_id in seg_ids))
+
+    def remove(self, segs):
+        '''
+        Removes :segs: from the tierset and updates the tiers of the pairs that contain them.
+
+        :return: the indices of the pairs whose tiers changed
+        '''
+        ipa_to_id = self.seginv.ipa_to_id
+        removed = set()
+        for seg in segs:
+            seg_id = ipa_to_id.get(f'{seg}')
+            if seg_id is not None and self._member[seg_id]:
+                removed.add(seg_id)
+                self.mask &= ~(1 << seg_id)
+                self._member[seg_id] = False
+                self.member[seg_id] = False
+        self.tierset.difference_update(segs)
+        self.delset = self.seginv.complement(self.tierset)
+
+        changed = self.pairs_with(removed)
+        for seg_id in removed:
+            self._pairs_with.pop(seg_id, None)
+        member = self._member
+        for pair_idx in changed:
+            uf_tier, sf_tier = self.uf_tiers[pair_idx], self.sf_tiers[pair_idx]
+            keep = list(i for i, seg_id in enumerate(uf_tier) if member[seg_id])
+            self.uf_tiers[pair_idx] = list(uf_tier[i] for i in keep)
+            self.sf_tiers[pair_idx] = list(sf_tier[i] for i in keep)
+        return changed
+
+class TierProjection:
+    '''
+    The tiers of every (uf, sf) pair in a Corpus, stored as ragged arrays:
+    the tier of the i-th pair is self.uf[self.offsets[i]:self.offsets[i + 1]] (likewise for self.sf),
+    and self.positions holds the position of each tier segment in its original (unprojected) word.
+    '''
+    def __init__(self, uf, sf, offsets, positions, seginv):
+        self.uf = uf
+        self.sf = sf
+        self.offsets = offsets
+        self.positions = positions
+        self.seginv = seginv
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, idx):
+        '''
+        :return: the (uf, sf) tiers of the :idx:-th pair as EncodedSequences
+        '''
+        start, end = self.offsets[idx : idx + 2].tolist()
+        return EncodedSequence(self.uf[start:end], self.seginv), EncodedSequence(self.sf[start:end], self.seginv)
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self[idx]
+
+def project_ragged(ids, offsets, member):
+    '''
+    Projects many words onto a tier with boolean masking over their flat array of ids.
+
+    :ids: a flat array of the segment ids of all words
+    :offsets: the offsets of the words into :ids: (i.e., word i is ids[offsets[i]:offsets[i + 1]])
+    :member: a boolean array indexed by segment id that is True for segments on the tier
+
+    :return: the ids on the tier, the offsets of each word's tier into them, the position of each tier segment in its original word,
+             and the boolean mask over :ids: of the segments that were kept
+    '''
+    keep = member[ids]
+    cum_kept = np.zeros(len(ids) + 1, dtype=np.int64)
+    np.cumsum(keep, out=cum_kept[1:])
+    starts = np.repeat(offsets[:-1], np.diff(offsets))
+    positions = (np.arange(len(ids), dtype=np.int64) - starts)[keep]
+    return ids[keep], cum_kept[offsets], positions, keep
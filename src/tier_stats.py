@@ -0,0 +1,38 @@
+from utils import LEFT_WORD_BOUNDARY, RIGHT_WORD_BOUNDARY
+
+class TierStats:
+    '''
+    The statistics D2L needs about the alternations of a discrepancy on a tier, which are gathered in a single pass over the tier projection of the training pairs (see D2L.tier_stats()):
+     - self.lcs and self.rcs: the left and right contexts of the alternations (segments or word boundaries)
+     - self.failures: for assimilation (True) and dissimilation (False), the adjacent segments that the alternations do not (dis)similate to
+    '''
+    def __init__(self, lcs, rcs, failures):
+        self.lcs = lcs
+        self.rcs = rcs
+        self.failures = failures
+
+    def contexts(self, left_right):
+        '''
+        :left_right: if 'left,' returns left contexts, otherwise (e.g., 'right'), returns right contexts
+        '''
+        return set(self.lcs) if left_right == 'left' else set(self.rcs)
+
+    def adj_that_do_not_work(self, assimilate):
+        return set(self.failures[assimilate])
+
+    @classmethod
+    def from_ids(cls, seginv, lc_ids, rc_ids, failed_ids):
+        '''
+        Builds the stats from segment ids, where None stands for the word boundary on that side.
+        '''
+        get_segment = seginv.get_segment
+        lcs = set(get_segment(seg_id) if seg_id is not None else LEFT_WORD_BOUNDARY for seg_id in lc_ids)
+        rcs = set(get_segment(seg_id) if seg_id is not None else RIGHT_WORD_BOUNDARY for seg_id in rc_ids)
+        failures = dict((assimilate, set(get_segment(seg_id) for seg_id in ids)) for assimilate, ids in failed_ids.items())
+        return cls(lcs, rcs, failures)
+
+    def __str__(self):
+        return f'TierStats(lcs={self.lcs}, rcs={self.rcs}, failures={self.failures})'
+
+    def __repr__(self):
+        return self.__str__()
@@ -49,6 +49,23 @@ def tolerance_principle(n, c, e=None):
         e = n - c
     return c > 2 and c > n / 2 and e <= n / np.log(n)
 
+def tolerance_bounds(n, c, remaining):
+    '''
+    Decides the Tolerance Principle early, while the counts of a rule are streamed in.
+
+    :n: the number of applications so far
+    :c: the number of correct applications so far
+    :remaining: an upper bound on the number of applications still to come
+
+    :return: True if the rule passes however the remaining applications turn out, False if it fails however they turn out, and None if it cannot be decided yet.
+             The best case is that all remaining applications happen and are correct, and the worst is that they all happen and are wrong.
+    '''
+    if not tolerance_principle(n + remaining, c + remaining):
+        return False
+    if tolerance_principle(n + remaining, c):
+        return True
+    return None
+
 def most_freq(l):
     item_to_count = defaultdict(int)
     for item in l:
@@ -0,0 +1,148 @@
+import unittest
+import sys
+import os
+import tempfile
+import importlib.util
+import numpy as np
+sys.path.append('../src/')
+from utils import load
+from corpus import Corpus
+from d2l import D2L
+from plp_grammar import PLP_Grammar
+from segment_inventory import SegmentInventory
+
+class TestCorpus(unittest.TestCase):
+    def test_corpus_1(self):
+        seginv = SegmentInventory('../data/finley/ipa.txt')
+        pairs = [('utS', 'uts'), ('apʃaS', 'apʃaʃ'), ('utS', 'uts')]
+        corpus = Corpus(pairs, seginv, freqs=[1, 2, 3])
+        assert(len(corpus) == 2)
+        assert(corpus.offsets.tolist() == [0, 3, 8])
+        assert(corpus.counts.tolist() == [2, 1])
+        assert(corpus.freqs.tolist() == [4, 2])
+        assert(corpus[0] == ('utS', 'uts'))
+        assert(corpus[1][1] == 'apʃaʃ')
+        assert(corpus[1][1].ids.obj is corpus.pairs[0][1].ids.obj) # views onto the same flat array
+        assert(list(corpus.tokens()) == [('utS', 'uts'), ('utS', 'uts'), ('apʃaS', 'apʃaʃ')])
+        assert('S' in seginv)
+
+    def test_corpus_pairs_with_1(self):
+        seginv = SegmentInventory('../data/finley/ipa.txt')
+        corpus = Corpus([('utS', 'uts'), ('apʃaS', 'apʃaʃ'), ('sigoS', 'sigos')], seginv)
+        ids = lambda segs: list(seginv.get_id(seg) for seg in segs)
+        assert(corpus.pairs_with(ids('S')).tolist() == [0, 1, 2])
+        assert(corpus.pairs_with(ids('ʃs')).tolist() == [1, 2])
+        assert(corpus.pairs_with(ids('a')).tolist() == [1])
+        assert(corpus.pairs_with([]).tolist() == [])
+        index = corpus._index
+        corpus.build_index() # already built
+        assert(corpus._index is index)
+
+    def test_corpus_count_segments_1(self):
+        seginv = SegmentInventory('../data/finley/ipa.txt')
+        corpus = Corpus([('utS', 'uts'), ('apʃaS', 'apʃaʃ'), ('sigoS', 'sigos')], seginv)
+        mask = seginv.table_mask({seginv['S'], seginv['ʃ']})
+        counts, total = corpus.count_segments(mask)
+        assert(counts.tolist() == [1, 2, 1] and total == 4)
+        assert(corpus.count_segments(mask)[0] is counts) # computed once per mask
+        assert(corpus.count_segments(seginv.table_mask({seginv['a']}))[0].tolist() == [0, 2, 0])
+
+    def test_corpus_select_1(self):
+        seginv = SegmentInventory('../data/finley/ipa.txt')
+        corpus = Corpus([('utS', 'uts'), ('apʃaS', 'apʃaʃ'), ('sigoS', 'sigos')], seginv)
+        flat, offsets = corpus.select(np.array([0, 2]))
+        assert(offsets.tolist() == [0, 3, 8])
+        assert(''.join(f'{seginv.get_segment(seg_id)}' for seg_id in corpus.sf[flat].tolist()) == 'utssigos')
+        flat, offsets = corpus.select(np.array([], dtype=np.int64))
+        assert(len(flat) == 0 and offsets.tolist() == [0])
+
+    def test_corpus_getitem_1(self):
+        seginv = SegmentInventory('../data/finley/ipa.txt')
+        corpus = Corpus([('utS', 'uts'), ('apʃaS', 'apʃaʃ'), ('sigoS', 'sigos')], seginv)
+        assert(corpus[-1] == ('sigoS', 'sigos') and corpus.uf_at(1) == 'apʃaS')
+        assert(corpus[1:] == [('apʃaS', 'apʃaʃ'), ('sigoS', 'sigos')])
+        assert(list(corpus) == corpus[:])
+        assert(corpus._pairs is None) # indexing and iterating do not create every pair
+        with self.assertRaises(IndexError):
+            corpus[3]
+        assert(corpus.pairs[1:] == corpus[1:]) # the same once the pairs are created
+        with self.assertRaises(IndexError):
+            corpus[3]
+
+    def test_corpus_length_1(self):
+        seginv = SegmentInventory('../data/finley/ipa.txt')
+        with self.assertRaises(ValueError):
+            Corpus([('utS', 'ut')], seginv)
+
+    def test_corpus_d2l(self):
+        train = [
+            ('ʃokuSiS', 'ʃokuʃiʃ'), 
+            ('apʃaS', 'apʃaʃ'),
+            ('ʃuniS', 'ʃuniʃ'),
+            ('sokiS', 'sokis'),
+            ('sigoSiS', 'sigosis'),
+            ('utS', 'uts')
+        ]
+        model = D2L(ipa_file='../data/finley/ipa.txt', verbose=False)
+        model.train(Corpus(train, SegmentInventory('../data/finley/ipa.txt')))
+        assert(f'{model.rule}' == "{S} --> ('ant',) / {+strid} __ / {+strid}")
+        for uf, sf in train:
+            assert(model.produce(uf) == sf)
+
+    @unittest.skipIf(importlib.util.find_spec('hmmlearn') is None, 'requires hmmlearn')
+    def test_corpus_gr_baseline(self):
+        from gr_baseline import GRbaseline
+        train = [('bada', 'bada')] * 3 + [('gika', 'gika'), ('bidi', 'bide'), ('tuta', 'tute')]
+        listed = GRbaseline(ipa_file='../data/ipa.txt', verbose=False)
+        listed.hmm.random_state = 0
+        listed.train(train)
+        encoded = GRbaseline(ipa_file='../data/ipa.txt', verbose=False)
+        encoded.hmm.random_state = 0
+        encoded.train(Corpus(train, encoded.seginv))
+        assert(listed.unigrams == encoded.unigrams and listed.bigrams == encoded.bigrams) # counted over tokens either way
+        assert(listed.tier_unigrams == encoded.tier_unigrams and listed.tier_bigrams == encoded.tier_bigrams)
+
+    def test_corpus_turkish(self):
+        pairs, freqs = load('../data/turkish/childes.txt', skip_header=True)
+        ipa_file = '../data/turkish/ipa.txt'
+        corpus = Corpus.from_file('../data/turkish/childes.txt', SegmentInventory(ipa_file), skip_header=True)
+        assert(sum(corpus.freqs) == sum(freqs))
+        assert(set(corpus) == set(pairs))
+        from_strs = PLP_Grammar(ipa_file=ipa_file, verbose=False)
+        from_strs.train(pairs)
+        from_corpus = PLP_Grammar(ipa_file=ipa_file, verbose=False)
+        from_corpus.train(corpus)
+        assert(set(map(str, from_strs.rules.values())) == set(map(str, from_corpus.rules.values())))
+
+    def test_corpus_binary_1(self):
+        seginv = SegmentInventory('../data/turkish/ipa.txt')
+        corpus = Corpus.from_file('../data/turkish/childes.txt', seginv, skip_header=True)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'childes.bin')
+            corpus.save(path)
+            opened = Corpus.open(path, SegmentInventory('../data/turkish/ipa.txt'))
+            assert(type(opened.uf) is np.memmap)
+            assert(len(opened) == len(corpus))
+            assert(list(opened) == list(corpus))
+            assert(opened[-1] == corpus[-1])
+            assert(opened.freqs.tolist() == corpus.freqs.tolist())
+            assert(opened.counts.tolist() == corpus.counts.tolist())
+            del opened # release the memory map before the directory is removed
+
+    def test_corpus_binary_remap_1(self):
+        corpus = Corpus([('soki', 'soki'), ('ut', 'ud')], SegmentInventory('../data/finley/ipa.txt'))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'corpus.bin')
+            corpus.save(path)
+            seginv = SegmentInventory('../data/ipa.txt')
+            opened = Corpus.open(path, seginv) # a different feature table, so the ids are remapped
+            assert(opened.uf.tolist() != corpus.uf.tolist())
+            assert(list(opened) == [('soki', 'soki'), ('ut', 'ud')])
+            assert(opened.freqs is None)
+            assert('d' in seginv)
+            Corpus([('utS', 'uts')], SegmentInventory('../data/finley/ipa.txt')).save(path)
+            with self.assertRaises(ValueError): # S is not in the default feature file
+                Corpus.open(path, SegmentInventory('../data/ipa.txt'))
+
+if __name__ == "__main__":
+    unittest.main()
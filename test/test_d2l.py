@@ -1,11 +1,15 @@
 import unittest
 import sys
 import random
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 sys.path.append('../src/')
-from utils import load
+from utils import load, LEFT_WORD_BOUNDARY, RIGHT_WORD_BOUNDARY
 from d2l import D2L
 from plp_grammar import PLP_Grammar
 from discrepancy import Discrepancy
+from tier import Tier
+from tier_stats import TierStats
+from natural_class import NaturalClass
 
 class TestD2L(unittest.TestCase):
     def test_init(self):
@@ -32,6 +36,102 @@ class TestD2L(unittest.TestCase):
         self.check(model, train)
         assert(f'{model.rule}' == "{S} --> ('ant',) / {+strid} __ / {+strid}")
 
+    def test_pairs_corpus(self):
+        model = D2L(ipa_file='../data/finley/ipa.txt', verbose=False)
+        model.train([('utS', 'uts'), ('sokiS', 'sokis')])
+        corpus = model._pairs_corpus()
+        assert(model._pairs_corpus() is corpus)
+        model.add_incremental(('utS', 'uts')) # already in the pairs
+        assert(model._pairs_corpus() is corpus)
+        model.train([('apʃaS', 'apʃaʃ'), ('ʃuniS', 'ʃuniʃ')]) # the same number of pairs
+        assert(sorted(f'{uf}' for uf, _ in model._pairs_corpus()) == ['apʃaS', 'ʃuniS'])
+        model.add_incremental(('utS', 'uts'))
+        assert(len(model._pairs_corpus()) == 3)
+
+    def test_tier_stats(self):
+        train = [('ʃokuSiS', 'ʃokuʃiʃ'), ('apʃaS', 'apʃaʃ'), ('sokiS', 'sokis'), ('utS', 'uts')]
+        model = D2L(ipa_file='../data/finley/ipa.txt', verbose=False)
+        model.train(train)
+        tier = Tier(NaturalClass({'+strid'}, model.seginv), model.seginv)
+        stats = model.tier_stats(model.discrepancy, tier)
+        assert(model.tier_stats(model.discrepancy, tier) is stats) # cached in model.stats
+        assert(not any(type(val) is TierStats for val in model.projections._entries.values())) # projections and stats do not share a budget
+        assert(stats.contexts('left') == model.contexts('left', model.discrepancy, tier))
+        assert(set(f'{seg}' for seg in stats.contexts('left')) == {'S', 's', 'ʃ', LEFT_WORD_BOUNDARY})
+        assert(set(f'{seg}' for seg in stats.contexts('right')) == {'S', RIGHT_WORD_BOUNDARY})
+        assert(set(f'{seg}' for seg in stats.adj_that_do_not_work(True)) == {'S'})
+        assert(set(f'{seg}' for seg in stats.adj_that_do_not_work(False)) == {'S', 's', 'ʃ'})
+
+    def test_discrepancy_sites(self):
+        train = [('ʃokuSiS', 'ʃokuʃiʃ'), ('apʃa', 'apʃa'), ('sokiS', 'sokis'), ('uti', 'uti')]
+        model = D2L(ipa_file='../data/finley/ipa.txt', verbose=False)
+        model.train(train)
+        corpus = model._pairs_corpus()
+        pair_idxs, positions, has_site = model.discrepancy.sites(corpus, model.seginv)
+        sites = set((f'{corpus[pair_idx][0]}', idx) for pair_idx, idx in zip(pair_idxs.tolist(), positions.tolist()))
+        assert(sites == set((f'{uf}', idx) for uf, idx, _ in model.discrepancy.annotated))
+        assert(sorted(f'{corpus[pair_idx][0]}' for pair_idx in has_site.nonzero()[0].tolist()) == ['sokiS', 'ʃokuSiS'])
+
+    def test_executor(self):
+        train = [('ʃokuSiS', 'ʃokuʃiʃ'), ('apʃaS', 'apʃaʃ'), ('ʃuniS', 'ʃuniʃ'), ('sokiS', 'sokis'), ('sigoSiS', 'sigosis'), ('utS', 'uts')]
+        model = D2L(ipa_file='../data/finley/ipa.txt', verbose=False).train(train)
+        for pool in (ThreadPoolExecutor, ProcessPoolExecutor):
+            with pool(max_workers=2) as executor:
+                parallel = D2L(ipa_file='../data/finley/ipa.txt', verbose=False, executor=executor).train(train)
+                assert(f'{parallel.rule}' == f'{model.rule}' and f'{parallel.default}' == f'{model.default}')
+                assert(parallel.rule.seginv is parallel.seginv and parallel.rule.tier.cache is parallel.projections)
+                self.check(parallel, train)
+                self.check(parallel.freeze(), train)
+
+    def test_executor_turkish(self):
+        pairs, _ = load('../data/turkish/childes.txt', skip_header=True)
+        model = PLP_Grammar(ipa_file='../data/turkish/ipa.txt', verbose=False)
+        model.train(pairs)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            for _ in range(3):
+                threaded = PLP_Grammar(ipa_file='../data/turkish/ipa.txt', verbose=False, executor=executor)
+                threaded.train(pairs)
+                assert(sorted(f'{rule}' for rule in threaded.rules.values()) == sorted(f'{rule}' for rule in model.rules.values()))
+                assert(sorted(f'{default}' for default in threaded.defaults.values()) == sorted(f'{default}' for default in model.defaults.values()))
+
+    def test_update(self):
+        train = [('ʃokuSiS', 'ʃokuʃiʃ'), ('apʃaS', 'apʃaʃ'), ('ʃuniS', 'ʃuniʃ'), ('sokiS', 'sokis'), ('sigoSiS', 'sigosis'), ('utS', 'uts')]
+        model = D2L(ipa_file='../data/finley/ipa.txt', verbose=False)
+        assert(model.update(train[:2])) # no rule yet
+        assert(model.update(train[2:4])) # a new alternation (S, s)
+        assert(model.update(train[4:])) # utS is not covered by the rule or default
+        assert(f'{model.rule}' == f'{D2L(ipa_file="../data/finley/ipa.txt", verbose=False).train(train).rule}')
+        new = [('sasuS', 'sasus'), ('utS', 'uts'), ('kitS', 'kits')]
+        assert(not model.update(new)) # warm start: the rule still works on the new words
+        assert(model._n_c == (8, 8))
+        assert(not model.update([('ʃasuS', 'ʃasuʃ')])) # an error the threshold tolerates
+        assert(model._n_c == (9, 8))
+        self.check(model, train + new)
+
+    def test_search_trace(self):
+        train = [('ʃokuSiS', 'ʃokuʃiʃ'), ('apʃaS', 'apʃaʃ'), ('ʃuniS', 'ʃuniʃ'), ('sokiS', 'sokis'), ('sigoSiS', 'sigosis'), ('utS', 'uts')]
+        model = D2L(ipa_file='../data/finley/ipa.txt', verbose=False).train(train)
+        trace = model.search_trace[True]
+        assert(list(visit['depth'] for visit in trace) == list(range(len(trace))))
+        assert(list(f'{visit["tier"]}' for visit in trace) == ['{*}', '{+cons}', '{+strid}'])
+        assert(trace[-1]['passed'] and trace[-1]['rule'] is model.rule and (trace[-1]['n'], trace[-1]['c']) == (7, 7))
+        assert(not any(visit['passed'] for visit in trace[:-1] + model.search_trace[False]))
+        fingerprints = list((visit['tier'].mask, model.seginv.table_mask(visit['tier'].delset)) for visit in trace)
+        assert(len(set(fingerprints)) == len(fingerprints)) # no tier is tried twice
+        shallow = D2L(ipa_file='../data/finley/ipa.txt', verbose=False, max_depth=1).train(train)
+        assert(shallow.rule is None and len(shallow.search_trace[True]) == 2)
+        hurried = D2L(ipa_file='../data/finley/ipa.txt', verbose=False, time_budget=0).train(train)
+        assert(hurried.rule is None and len(hurried.search_trace[True]) == 1)
+
+    def test_bounded(self):
+        pairs, _ = load('../data/turkish/childes.txt', skip_header=True)
+        model = PLP_Grammar(ipa_file='../data/turkish/ipa.txt', verbose=False)
+        model.train(pairs)
+        bounded = PLP_Grammar(ipa_file='../data/turkish/ipa.txt', verbose=False, bounded=True)
+        bounded.train(pairs)
+        assert(sorted(f'{rule}' for rule in model.rules.values()) == sorted(f'{rule}' for rule in bounded.rules.values()))
+        assert(sorted(f'{default}' for default in model.defaults.values()) == sorted(f'{default}' for default in bounded.defaults.values()))
+
     def test_turkish(self):
         pairs, _ = load('../data/turkish/childes.txt', skip_header=True)
         model = PLP_Grammar(ipa_file='../data/turkish/ipa.txt', verbose=False)
@@ -65,5 +165,25 @@ class TestD2L(unittest.TestCase):
 
         assert(f'{model.rule}' == "{L} <-- ('lat',) / {+cons} __ / {+cons}")
 
+    def test_freeze(self):
+        train = [
+            ('ʃokuSiS', 'ʃokuʃiʃ'), 
+            ('apʃaS', 'apʃaʃ'),
+            ('ʃuniS', 'ʃuniʃ'),
+            ('sokiS', 'sokis'),
+            ('sigoSiS', 'sigosis'),
+            ('utS', 'uts')
+        ]
+        model = D2L(ipa_file='../data/finley/ipa.txt', verbose=False)
+        model.train(train)
+        frozen = model.freeze()
+        ufs = ['ʃokuSiS', 'sigoSiS', 'tʃiS', 'ʃubaS'] * 10 # the last two contain segments unseen in training
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            preds = list(executor.map(lambda uf: f'{frozen.produce(uf)}', ufs))
+        assert(preds == list(f'{model.produce(uf)}' for uf in ufs))
+        assert('b' not in frozen.seginv) # segments seen during inference are not added to the frozen inventory
+        with self.assertRaises(RuntimeError): # outside of produce(), unseen segments cannot be added
+            frozen.train([('mabaS', 'mabas')])
+
 if __name__ == "__main__":
     unittest.main()
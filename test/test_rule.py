@@ -0,0 +1,129 @@
+import unittest
+import sys
+sys.path.append('../src/')
+from rule import Rule, CompiledRule
+from default_rule import DefaultRule
+from tier import Tier
+from corpus import Corpus
+from lru_cache import LRUCache
+from natural_class import NaturalClass
+from segment_inventory import SegmentInventory
+
+class TestRule(unittest.TestCase):
+    def test_compile_1(self):
+        seginv = SegmentInventory('../data/finley/ipa.txt', add_segs=True)
+        tier = Tier(NaturalClass({'+strid'}, seginv), seginv)
+        rule = Rule(target={seginv['S']}, feats=('ant',), lc={seginv['s'], seginv['ʃ']}, tier=tier, seginv=seginv)
+        compiled = rule.compile()
+        assert(type(compiled) is CompiledRule and rule.compile() is compiled)
+        assert(rule('sigoSiS') == 'sigosis')
+        assert(rule('ʃokuSiS') == 'ʃokuʃiʃ')
+        assert(rule('utS') == 'utS') # no left context on the tier
+        rule.update_c(tier.tierset)
+        assert(rule.compile() is not compiled) # recompiled for the new context
+        assert(rule('sigoSiS') == 'sigosis')
+        assert(rule.get_n_c([('sigoSiS', 'sigosis'), ('ʃokuSiS', 'ʃokusis')]) == (4, 2))
+
+    def test_compile_2(self):
+        seginv = SegmentInventory('../data/finley/ipa.txt', add_segs=True)
+        tier = Tier(NaturalClass({'+strid'}, seginv), seginv)
+        rule = Rule(target={seginv['S']}, feats=('ant',), rc={seginv['s'], seginv['ʃ']}, tier=tier, seginv=seginv)
+        assert(rule('Sis') == 'sis')
+        assert(rule('SiSuʃ') == 'ʃiʃuʃ') # applies right to left, sequentially
+        default = DefaultRule(target={seginv['S']}, feats=('ant',), vals=('+',), seginv=seginv)
+        assert(default('utS') == 'uts')
+        assert(default.get_changes('SiS') == [(0, 's'), (2, 's')])
+
+    def test_evaluate_many_1(self):
+        seginv = SegmentInventory('../data/finley/ipa.txt', add_segs=True)
+        tier = Tier(NaturalClass({'+strid'}, seginv), seginv)
+        rule = Rule(target={seginv['S']}, feats=('ant',), lc=NaturalClass({'+strid'}, seginv), tier=tier, seginv=seginv)
+        pairs = [('sigoSiS', 'sigosis'), ('ʃokuSiS', 'ʃokusis'), ('utS', 'uts')]
+        corpus = Corpus(pairs, seginv)
+        evaluation = rule.evaluate_many(corpus)
+        assert((evaluation.n, evaluation.c) == rule.get_n_c(pairs) == rule.get_n_c(corpus) == (4, 2))
+        assert(evaluation.positions.tolist() == [4, 6, 4, 6])
+        assert(evaluation.correct.tolist() == [True, True, False, False])
+        assert(evaluation.word_n.tolist() == [2, 2, 0] and evaluation.word_c.tolist() == [2, 0, 0])
+        assert(evaluation.get_apps() == rule.get_apps(pairs))
+        assert(evaluation.accuracy() == rule.accuracy(pairs) == 0.5)
+
+    def test_evaluate_many_memo_1(self):
+        seginv = SegmentInventory('../data/finley/ipa.txt', add_segs=True)
+        pairs = [('sigoSiS', 'sigosis'), ('ʃokuSiS', 'ʃokusis'), ('utS', 'uts')]
+        corpus = Corpus(pairs, seginv)
+        memo = LRUCache()
+        build = lambda: Rule(target={seginv['S']}, feats=('ant',), lc=NaturalClass({'+strid'}, seginv), tier=Tier(NaturalClass({'+strid'}, seginv), seginv), seginv=seginv)
+        first = build().evaluate_many(corpus, memo=memo)
+        assert(memo.hits == 0 and len(memo) == len(pairs))
+        second = build().evaluate_many(corpus, memo=memo) # an equivalent rule is served from the memo
+        assert(memo.hits == len(pairs))
+        assert((first.n, first.c) == (second.n, second.c) == (4, 2))
+        rule = build()
+        rule.update_c({seginv['s']}) # a different rule
+        assert(rule.evaluate_many(corpus, memo=memo).n == 2)
+        assert(memo.hits == len(pairs) and len(memo) == 2 * len(pairs))
+
+    def test_evaluate_many_skip_1(self):
+        seginv = SegmentInventory('../data/finley/ipa.txt', add_segs=True)
+        pairs = [('sigoSiS', 'sigosis'), ('kutu', 'kutu'), ('utS', 'uts'), ('ʃoki', 'ʃoki')]
+        corpus = Corpus(pairs, seginv)
+        memo = LRUCache()
+        rule = Rule(target={seginv['S']}, feats=('ant',), lc=NaturalClass({'+strid'}, seginv), tier=Tier(NaturalClass({'+strid'}, seginv), seginv), seginv=seginv)
+        evaluation = rule.evaluate_many(corpus, memo=memo)
+        assert(len(memo) == 2) # only the words with a target segment are visited
+        assert((evaluation.n, evaluation.c) == rule.get_n_c(pairs) == (2, 2))
+        assert(evaluation.word_n.tolist() == [2, 0, 0, 0])
+
+    def test_verify_1(self):
+        seginv = SegmentInventory('../data/finley/ipa.txt', add_segs=True)
+        pairs = [('sigoSiS', 'sigosis'), ('ʃokuSiS', 'ʃokuʃiʃ'), ('kutu', 'kutu'), ('sasuS', 'sasus'), ('utS', 'uts'), ('sisaS', 'sisas'), ('ʃaSuS', 'ʃaʃuʃ')]
+        corpus = Corpus(pairs, seginv)
+        tier = Tier(NaturalClass({'+strid'}, seginv), seginv)
+        good = Rule(target={seginv['S']}, feats=('ant',), lc=NaturalClass({'+strid'}, seginv), tier=tier, seginv=seginv)
+        assert(good.get_n_c(corpus) == (8, 8) and good.verify(corpus) == (True, 5, 5)) # accepted before the last words
+        bad = Rule(target={seginv['S']}, feats=('ant',), lc=NaturalClass({'+strid'}, seginv), tier=tier, seginv=seginv, assimilate=False)
+        assert(bad.get_n_c(corpus) == (8, 3) and bad.verify(corpus) == (False, 6, 2)) # rejected before the last word
+        assert(bad.verify(pairs) == (False, 6, 2) and good.verify(pairs)[0] == True)
+        always = lambda n, c: True
+        assert(bad.verify(corpus, threshold=always) == (True, 8, 3)) # other thresholds are checked after all words
+        passed, n, c, evaluation = good.verify(corpus, memo=LRUCache(), evaluate=True)
+        full = good.evaluate_many(corpus)
+        assert((passed, n, c) == (True, 5, 5) and (evaluation.n, evaluation.c) == (8, 8)) # the evaluation covers the pairs after the outcome was decided
+        assert(evaluation.pair_idxs.tolist() == full.pair_idxs.tolist() and evaluation.new_ids.tolist() == full.new_ids.tolist())
+        assert(bad.verify(corpus, evaluate=True) == (False, 6, 2, None))
+
+    def test_reevaluate_1(self):
+        seginv = SegmentInventory('../data/finley/ipa.txt', add_segs=True)
+        pairs = [('sigoSiS', 'sigosis'), ('ʃokuSiS', 'ʃokusis'), ('utS', 'uts'), ('Sapʃi', 'ʃapʃi'), ('kuSoʃ', 'kuʃoʃ')]
+        corpus = Corpus(pairs, seginv)
+        tier = Tier(NaturalClass({'+strid'}, seginv), seginv)
+        for ctxt in ({seginv['s']}, {seginv['ʃ']}, {seginv['s'], seginv['S']}):
+            rule = Rule(target={seginv['S']}, feats=('ant',), rc=ctxt, tier=tier, seginv=seginv)
+            before = rule.evaluate_many(corpus)
+            rule.update_c(tier.tierset)
+            changed_mask = seginv.table_mask(ctxt) ^ seginv.table_mask(tier.tierset)
+            after = rule.reevaluate(before, changed_mask, memo=LRUCache())
+            full = rule.evaluate_many(corpus)
+            assert(after.pair_idxs.tolist() == full.pair_idxs.tolist())
+            assert(after.positions.tolist() == full.positions.tolist())
+            assert(after.new_ids.tolist() == full.new_ids.tolist())
+            assert((after.n, after.c) == (full.n, full.c))
+
+    def test_reevaluate_2(self):
+        seginv = SegmentInventory('../data/finley/ipa.txt', add_segs=True)
+        pairs = [('ʃaSu', 'ʃaʃu'), ('Saʃu', 'saʃu'), ('sokiS', 'sokis'), ('kuʃa', 'kuʃa')]
+        corpus = Corpus(pairs, seginv)
+        tier = Tier(NaturalClass({'+strid'}, seginv), seginv)
+        rule = Rule(target={seginv['S']}, feats=('ant',), lc={seginv['s']}, tier=tier, seginv=seginv)
+        before = rule.evaluate_many(corpus)
+        rule.update_c({seginv['s'], seginv['ʃ']})
+        memo = LRUCache()
+        after = rule.reevaluate(before, seginv.table_mask({seginv['ʃ']}), memo=memo)
+        assert(len(memo) == 1) # only ʃaSu has ʃ to the left of a target on the tier
+        full = rule.evaluate_many(corpus)
+        assert(after.positions.tolist() == full.positions.tolist() and after.new_ids.tolist() == full.new_ids.tolist())
+        assert((after.n, after.c) == (full.n, full.c) == (2, 2))
+
+if __name__ == "__main__":
+    unittest.main()
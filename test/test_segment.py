@@ -44,5 +44,17 @@ class TestSegment(unittest.TestCase):
         assert(s2 in segs)
         assert(s3 not in segs)
 
+    def test_interned_1(self):
+        alph = SegmentInventory(segs={'b', 'p'})
+        b = alph['b']
+        assert(alph['b'] is b)
+        assert(b.id == alph.get_id('b'))
+        assert(alph.get_segment(b.id) is b)
+        assert(b == Segment('b'))
+        assert(b != alph['p'])
+        assert('b' in {b} and b in {'b'})
+        with self.assertRaises(AttributeError): # Segments use __slots__
+            b.foo = 1
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -1,9 +1,13 @@
 from audioop import add
 import unittest
 import sys
+import os
+import shutil
+import tempfile
 sys.path.append('../src/')
 from natural_class import NaturalClass
 from segment_inventory import SegmentInventory
+from feature_table import FeatureTable
 
 class TestSegmentInventory(unittest.TestCase):
     def test_ipa_files(self):
@@ -111,5 +115,109 @@ class TestSegmentInventory(unittest.TestCase):
         assert(alph.dissimilate('r', 'r', ('ant', 'lat')) == 'l')
         assert(alph.dissimilate('l', 'l', ('ant', 'lat')) == 'r')
 
+    def test_feature_matrix_1(self):
+        seginv = SegmentInventory(add_segs=True)
+
+        b = seginv['b']
+        b_id = seginv.get_id(b)
+        assert(seginv.get_id('b') == b_id)
+        assert(seginv.get_id(b.feature_vec) == b_id)
+        assert(seginv.get_segment(b_id) == b)
+        assert(seginv.feature_matrix.shape == (len(seginv.id_to_ipa), len(seginv.feature_space)))
+        assert(list('+-?'[[1, -1, 0].index(code)] for code in seginv.feature_matrix[b_id]) == b.feature_vec)
+
+    def test_feature_matrix_2(self):
+        seginv = SegmentInventory(segs={'b'})
+
+        assert('p' not in seginv)
+        assert(seginv.without_feats('b', 'voice') is None) # p is in the feature file, but has not been added
+        with self.assertRaises(KeyError):
+            seginv.get_id('p')
+        seginv.add_segment('p')
+        assert(seginv.without_feats('b', 'voice') == 'p')
+
+    def test_transition_table_1(self):
+        seginv = SegmentInventory(segs={'b', 'd'})
+
+        table = seginv.transition_table('voice', only_underspec=False, assimilate=False)
+        assert(table[seginv.get_id('d'), seginv.get_id('d')] is None) # t has not been added
+        assert(seginv.dissimilate('d', 'd', 'voice') is None)
+        seginv.add_segment('t')
+        table = seginv.transition_table('voice', only_underspec=False, assimilate=False)
+        assert(table[seginv.get_id('d'), seginv.get_id('d')] == seginv.get_id('t'))
+        assert(seginv.dissimilate('d', 'd', 'voice') == 't')
+
+    def test_shared_feats_1(self):
+        seginv = SegmentInventory('../data/finley/ipa.txt', add_segs=True)
+        shared = seginv.shared_feats({'s', 'ʃ'})
+        assert('+strid' in shared)
+        assert('+ant' not in shared and '-ant' not in shared)
+        assert(shared == seginv.feat_vals('s', exclude_unspec=True).intersection(seginv.feat_vals('ʃ', exclude_unspec=True)))
+
+    def test_extension_mask_1(self):
+        seginv = SegmentInventory('../data/finley/ipa.txt', segs={'s', 'ʃ', 'p'})
+        mask = seginv.extension_mask({'+strid'})
+        assert(seginv.from_mask(mask) == {'s', 'ʃ'})
+        assert(mask & (1 << seginv.ipa_to_id['S'])) # S has not been added, but is still in the feature file
+        assert(seginv.extension_complement({'+strid'}) == {'p', '?'})
+        assert(seginv.complement({'s', 'p'}) == {'ʃ', '?'})
+
+    def test_natural_class_1(self):
+        seginv = SegmentInventory('../data/finley/ipa.txt', segs={'s', 'p'})
+        nc = NaturalClass({'+strid'}, seginv)
+        assert(nc.extension_str == '{s}')
+        assert('ʃ' in nc) # membership is decided by features, even for segments that have not been added
+        seginv.add_segment('ʃ')
+        assert(nc.extension_str == '{s,ʃ}')
+        nc.add_feat('+ant')
+        assert(nc.extension_str == '{s}')
+        assert('ʃ' not in nc)
+        assert(NaturalClass({'+strid', '+ant'}, seginv).mask == nc.mask)
+
+    def test_feature_table_1(self):
+        seginv1 = SegmentInventory('../data/finley/ipa.txt', segs={'s'})
+        seginv2 = SegmentInventory('../data/finley/ipa.txt', add_segs=True)
+        assert(seginv1.table is seginv2.table) # both inventories share one table
+        assert('p' not in seginv1 and 'p' in seginv2)
+
+        table = FeatureTable._load_compiled(seginv1.table_path, use_cache=True) # read back from the on-disk cache
+        assert(table is not seginv1.table)
+        assert(table.id_to_ipa == seginv1.table.id_to_ipa)
+        assert((table.feature_matrix == seginv1.feature_matrix).all())
+        assert(table.feat_masks == seginv1.table.feat_masks)
+
+    def test_feature_table_stale_cache_1(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'ipa.txt')
+            shutil.copyfile('../data/finley/ipa.txt', path)
+            with open(f'{path}.pkl', 'wb') as f:
+                f.write(b'cno_such_module\nFeatureTable\n.') # a pickle of a class from a module that no longer exists
+            table = FeatureTable._load_compiled(path, use_cache=True) # rebuilt from the file
+            assert(table.id_to_ipa == FeatureTable._load_compiled('../data/finley/ipa.txt', use_cache=True).id_to_ipa)
+            assert(FeatureTable._load_compiled(path, use_cache=True).id_to_ipa == table.id_to_ipa) # and the cache was rewritten
+
+    def test_frozen_segments_1(self):
+        frozen = SegmentInventory('../data/finley/ipa.txt', segs={'s', 'a'}).freeze()
+        with frozen.session():
+            frozen.add_segment('p')
+            assert('p' in set(f'{seg}' for seg in frozen.segments)) # segments added during the session are included
+            assert(frozen.segments == frozen.extension(set()))
+        assert('p' not in set(f'{seg}' for seg in frozen.segments))
+        assert(frozen.segments == frozen.extension(set()))
+
+    def test_lazy_1(self):
+        seginv = SegmentInventory(add_segs=True, lazy=True)
+        assert(len(seginv.ipa_to_segment) == 0) # no Segment objects have been created yet
+        assert('b' in seginv)
+        b = seginv['b']
+        assert(seginv['b'] is b)
+        assert(seginv.without_feats('b', 'voice') == 'p')
+        assert(set(seginv.ipa_to_segment.keys()) == {'b', 'p'})
+
+        eager = SegmentInventory(add_segs=True)
+        assert(seginv.extension({'+voice'}) == eager.extension({'+voice'}))
+        assert(seginv.complement({'b'}) == eager.complement({'b'}))
+        assert(seginv.segments == eager.segments)
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,43 @@
+import unittest
+import sys
+from array import array
+import numpy as np
+sys.path.append('../src/')
+from sequence import Sequence
+from encoded_sequence import EncodedSequence
+from segment_inventory import SegmentInventory
+
+class TestSequence(unittest.TestCase):
+    def test_encoded_1(self):
+        seginv = SegmentInventory('../data/finley/ipa.txt', add_segs=True)
+        s = EncodedSequence('sigoSiS', seginv)
+        assert(len(s) == 7)
+        assert(s == 'sigoSiS')
+        assert(s == Sequence('sigoSiS', seginv))
+        assert(Sequence('sigoSiS', seginv) == s)
+        assert(hash(s) == hash(Sequence('sigoSiS', seginv)))
+        assert(s[0] == 's' and s[-1] == 'S')
+        assert(s[0] is seginv['s'])
+        assert(list(s) == list('sigoSiS'))
+
+    def test_encoded_slice_1(self):
+        seginv = SegmentInventory('../data/finley/ipa.txt', add_segs=True)
+        ids = array('H', (seginv.get_id(seg) for seg in 'sigoSiS'))
+        s = EncodedSequence(ids, seginv)
+        tail = s[4:]
+        assert(tail == 'SiS')
+        assert(tail.ids.obj is ids) # slices are views onto the same ids
+        assert(tail == EncodedSequence('SiS', seginv))
+        assert(len({s[0:3], EncodedSequence('sig', seginv), 'sig'}) == 1)
+
+    def test_encoded_numpy_1(self):
+        seginv = SegmentInventory('../data/finley/ipa.txt', add_segs=True)
+        ids = np.array([seginv.get_id(seg) for seg in 'utS'], dtype=np.uint16)
+        s = EncodedSequence(ids, seginv)
+        assert(s == 'utS')
+        out = s.copy()
+        out[2] = seginv['s']
+        assert(out == 'uts' and s == 'utS')
+
+if __name__ == "__main__":
+    unittest.main()
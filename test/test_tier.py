@@ -0,0 +1,75 @@
+import unittest
+import sys
+sys.path.append('../src/')
+from corpus import Corpus
+from tier import Tier, IncrementalTier
+from lru_cache import LRUCache
+from d2l import D2L
+from natural_class import NaturalClass
+from segment_inventory import SegmentInventory
+
+class TestTier(unittest.TestCase):
+    def test_project_1(self):
+        seginv = SegmentInventory('../data/finley/ipa.txt', add_segs=True)
+        tier = Tier(NaturalClass({'+strid'}, seginv), seginv)
+        uf_tier, sf_tier = tier.project('sigoSiS', 'sigosis')
+        assert(uf_tier == 'sSS' and sf_tier == 'sss')
+        assert(tier.project_ids([seginv.get_id(seg) for seg in 'utS']) == ((seginv.get_id('S'),), (2,)))
+
+    def test_project_many_1(self):
+        seginv = SegmentInventory('../data/finley/ipa.txt')
+        pairs = [('ʃokuSiS', 'ʃokuʃiʃ'), ('utS', 'uts'), ('mabu', 'mabu')]
+        corpus = Corpus(pairs, seginv)
+        for tierset in [NaturalClass({'+strid'}, seginv), {seginv['u'], seginv['t']}]:
+            tier = Tier(tierset, seginv)
+            proj = tier.project_many(corpus)
+            assert(len(proj) == len(pairs))
+            for (uf, sf), (uf_tier, sf_tier) in zip(pairs, proj):
+                assert((uf_tier, sf_tier) == tier.project(uf, sf))
+        assert(proj.offsets.tolist() == [0, 1, 3, 4])
+        assert(proj.positions.tolist() == [3, 0, 1, 3]) # positions in the original words
+
+    def test_incremental_1(self):
+        seginv = SegmentInventory('../data/finley/ipa.txt')
+        pairs = [('ʃokuSiS', 'ʃokuʃiʃ'), ('utS', 'uts'), ('mabu', 'mabu')]
+        corpus = Corpus(pairs, seginv)
+        tier = IncrementalTier(seginv.segments, seginv, corpus)
+        changed = tier.remove({seginv['u'], seginv['k']})
+        assert(changed == {0, 1, 2})
+        assert(tier.remove({seginv['t']}) == {1})
+        fresh = Tier(seginv.complement({'u', 'k', 't'}), seginv)
+        for pair_idx, (uf, sf) in enumerate(pairs):
+            uf_tier, sf_tier = fresh.project(uf, sf)
+            assert(uf_tier == ''.join(seginv.id_to_ipa[seg_id] for seg_id in tier.uf_tiers[pair_idx]))
+            assert(sf_tier == ''.join(seginv.id_to_ipa[seg_id] for seg_id in tier.sf_tiers[pair_idx]))
+        assert('u' in tier.delset and 'u' not in tier)
+
+    def test_cache_1(self):
+        cache = LRUCache(maxsize=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        assert(cache.get('a') == 1) # 'b' is now the least recently used
+        cache.put('c', 3)
+        assert('b' not in cache and 'a' in cache and 'c' in cache)
+        assert(cache.get('b') is None)
+        assert(cache.hits == 1 and cache.misses == 1)
+
+    def test_cache_2(self):
+        train = [
+            ('ʃokuSiS', 'ʃokuʃiʃ'), 
+            ('apʃaS', 'apʃaʃ'),
+            ('ʃuniS', 'ʃuniʃ'),
+            ('sokiS', 'sokis'),
+            ('sigoSiS', 'sigosis'),
+            ('utS', 'uts')
+        ]
+        model = D2L(ipa_file='../data/finley/ipa.txt', verbose=False)
+        model.train(train)
+        assert(model.projections.hits > 0) # the same tiers are projected more than once during the search
+        uncached = D2L(ipa_file='../data/finley/ipa.txt', projection_cache_size=0, verbose=False)
+        uncached.train(train)
+        assert(len(uncached.projections) == 0)
+        assert(f'{uncached.rule}' == f'{model.rule}')
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,7 +2,7 @@ import unittest
 import sys
 from collections import defaultdict
 sys.path.append('../src/')
-from utils import most_freq
+from utils import most_freq, tolerance_principle, tolerance_bounds
 
 class TestUtils(unittest.TestCase):
     def test_most_freq_1(self):
@@ -20,5 +20,16 @@ class TestUtils(unittest.TestCase):
     def test_most_freq_5(self):
         assert(most_freq(['a', 'b', 'b', 'c']) == 'b')
 
+    def test_tolerance_bounds_1(self):
+        for n in range(30):
+            for c in range(n + 1):
+                for remaining in range(15):
+                    outcomes = set(tolerance_principle(n + more, c + correct) for more in range(remaining + 1) for correct in range(more + 1))
+                    decided = tolerance_bounds(n, c, remaining)
+                    assert(decided is None or outcomes == {decided})
+        assert(tolerance_bounds(10, 2, 0) == tolerance_principle(10, 2) == False)
+        assert(tolerance_bounds(100, 100, 10) == True)
+        assert(tolerance_bounds(0, 0, 10) is None)
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
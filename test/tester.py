@@ -1,6 +1,10 @@
 import unittest
 from test_segment_inventory import TestSegmentInventory
 from test_segment import TestSegment
+from test_sequence import TestSequence
+from test_corpus import TestCorpus
+from test_tier import TestTier
+from test_rule import TestRule
 from test_utils import TestUtils
 from test_d2l import TestD2L
 
@@ -10,12 +14,20 @@ A script to run all the test cases.
 # load test suites
 test_seginv_suite = unittest.TestLoader().loadTestsFromTestCase(TestSegmentInventory)
 test_segment_suite = unittest.TestLoader().loadTestsFromTestCase(TestSegment)
+test_sequence_suite = unittest.TestLoader().loadTestsFromTestCase(TestSequence)
+test_corpus_suite = unittest.TestLoader().loadTestsFromTestCase(TestCorpus)
+test_tier_suite = unittest.TestLoader().loadTestsFromTestCase(TestTier)
+test_rule_suite = unittest.TestLoader().loadTestsFromTestCase(TestRule)
 test_utils_suite = unittest.TestLoader().loadTestsFromTestCase(TestUtils)
 test_d2l_suite = unittest.TestLoader().loadTestsFromTestCase(TestD2L)
 # combine the test suites
 suites = unittest.TestSuite([
     test_seginv_suite,
     test_segment_suite,
+    test_sequence_suite,
+    test_corpus_suite,
+    test_tier_suite,
+    test_rule_suite,
     test_utils_suite,
     test_d2l_suite
 ])